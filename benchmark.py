@@ -0,0 +1,36 @@
+import argparse
+import os
+import sys
+from utils.benchmarks import run_benchmarks, save_benchmarks, load_benchmarks, compare_benchmarks
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description = "Benchmark the simulation engines, samplers and sweep")
+    parser.add_argument('--output', default = os.path.join('data', 'benchmarks', 'latest.json'),
+                        help = "where to save the results as JSON")
+    parser.add_argument('--baseline', default = None, help = "JSON results to compare against")
+    parser.add_argument('--tolerance', type = float, default = 0.2,
+                        help = "relative slowdown flagged as a regression")
+    parser.add_argument('--quick', action = 'store_true', help = "run a reduced version of the suite")
+    args = parser.parse_args()
+
+    benchmarks = run_benchmarks(quick = args.quick)
+
+    for record in benchmarks['results']:
+        rate = f" ({record['rate']:.3g} {record['unit']})" if 'rate' in record else ""
+        print(f"{record['name']} {record['parameters']}: {record['seconds']:.4g}s{rate}")
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok = True)
+    save_benchmarks(benchmarks, args.output)
+    print(f"\nResults saved to {args.output}")
+
+    if args.baseline is not None:
+        comparisons = compare_benchmarks(benchmarks, load_benchmarks(args.baseline), args.tolerance)
+        regressions = [comparison for comparison in comparisons if comparison['regression']]
+
+        for comparison in regressions:
+            print(f"REGRESSION {comparison['name']} {comparison['parameters']}: "
+                  f"{comparison['baseline_seconds']:.4g}s -> {comparison['seconds']:.4g}s ({comparison['ratio']:.2f}x)")
+
+        print(f"\n{len(regressions)} regressions out of {len(comparisons)} compared benchmarks")
+        sys.exit(1 if regressions else 0)
@@ -1,12 +1,16 @@
-from typing import List, Dict
-from helpers.customer import Customer
+import heapq
+from helpers.customer_store import CustomerStore
+from helpers.statistics import StreamingStatistics
 
 """File containing the required classes for our simulation"""
 
 class Bus:
-    def __init__(self, seats: int, customer_history: List[Dict] = None, verbose: bool = False):
+    def __init__(
+        self, seats: int, customers: CustomerStore, verbose: bool = False, statistics: StreamingStatistics = None):
 
-        """This class is responsible for acting as the servers in our system"""
+        """This class is responsible for acting as the servers in our system. Seats hold customer ids of the store
+        and served customers keep their times in it; when statistics are given, served customers are also recorded in
+        them and their ids released for reuse"""
 
         # Instantiate empty seats in the bus
         self.seats = [None for _ in range(seats)]
@@ -19,16 +23,14 @@ class Bus:
 
         self.verbose = verbose
 
-        if customer_history is None:
-            customer_history = list()
-
-        self.customer_history = customer_history
+        self.customers = customers
+        self.statistics = statistics
 
     def get_next_departure_time(self):
         """This function gets the minimum next time that a customer leaves his seat (has been served)"""
         return min(self.departure_times)
 
-    def customer_boards(self, customer: Customer, time: float, serving_time: float):
+    def customer_boards(self, customer: int, time: float, serving_time: float):
         """This function finds the entering customer a seat in the bus (begins being served)"""
         if self.free_seats == 0:
 
@@ -42,7 +44,7 @@ class Bus:
         # Assign that seat to the new customer
         self.seats[available_seat] = customer
         # Update the boarding time of the new customer
-        customer.board_bus(time)
+        self.customers.board_bus(customer, time)
         # Set the departure time of the customer as the time the customer would be leaving
         self.departure_times[available_seat] = serving_time
         # Update the number of free seats in the bus
@@ -60,11 +62,7 @@ class Bus:
             # Get the customer who is supposed to leave at the current time
             customer = self.seats[seat_number]
             # Make them leave
-            customer.alight_bus(current_time)
-            self.customer_history.append(customer.calculate_stats())
-
-            if self.verbose:
-                print(customer.calculate_stats())
+            self.customer_leaves(customer, current_time)
 
             # Update the seat and departure time of the empty seat number
             self.seats[seat_number] = None
@@ -77,7 +75,89 @@ class Bus:
         # Return the number of customers served in the current timestep
         return customers_served
 
+    def customer_leaves(self, customer: int, current_time: float):
+        """This function notes down the departure of a customer who has been served"""
+
+        self.customers.alight_bus(customer, current_time)
+
+        if self.verbose:
+            print(self.customers.calculate_stats(customer))
+
+        if self.statistics is not None:
+            self.statistics.record_served(
+                self.customers.arrival_times[customer], self.customers.boarded_times[customer], current_time)
+            self.customers.release(customer)
+
     def calculate_stats(self):
         """This function returns the relevant statistics for our class of servers"""
 
-        return {'total_customers_served': self.total_customers_served}
\ No newline at end of file
+        return {'total_customers_served': self.total_customers_served}
+
+class HeapBus(Bus):
+    def __init__(
+        self, seats: int, customers: CustomerStore, verbose: bool = False, statistics: StreamingStatistics = None):
+
+        """This class is an indexed event-calendar version of Bus, keeping a min-heap of departures and a stack of
+        free seats so that boarding and alighting cost O(log seats) instead of a scan over every seat"""
+
+        super().__init__(seats, customers, verbose, statistics)
+
+        # Min-heap of (departure time, seat number) for every occupied seat
+        self.departure_heap = []
+        # Stack of free seat numbers, lowest seat number on top to mirror the list-based bus
+        self.free_seat_stack = list(range(seats - 1, -1, -1))
+
+    def get_next_departure_time(self):
+        """This function gets the minimum next time that a customer leaves his seat (has been served)"""
+        return self.departure_heap[0][0] if self.departure_heap else float('inf')
+
+    def customer_boards(self, customer: int, time: float, serving_time: float):
+        """This function finds the entering customer a seat in the bus (begins being served)"""
+        if self.free_seats == 0:
+
+            if self.verbose:
+                print("No seats available!")
+
+            return
+
+        # Take a free seat off the stack
+        available_seat = self.free_seat_stack.pop()
+        # Assign that seat to the new customer
+        self.seats[available_seat] = customer
+        # Update the boarding time of the new customer
+        self.customers.board_bus(customer, time)
+        # Schedule the departure of the customer in the event calendar
+        self.departure_times[available_seat] = serving_time
+        heapq.heappush(self.departure_heap, (serving_time, available_seat))
+        # Update the number of free seats in the bus
+        self.free_seats -= 1
+
+    def customers_alight(self, current_time: float):
+        """This function takes into account the code flow when a customer is done being served"""
+
+        customers_served = 0
+
+        # Possible that multiple customers may have identical serving times
+        while self.departure_heap and self.departure_heap[0][0] == current_time:
+            # Get the seat of the customer who is supposed to leave at the current time
+            _, seat_number = heapq.heappop(self.departure_heap)
+            # Get the customer who is supposed to leave at the current time
+            customer = self.seats[seat_number]
+            # Make them leave
+            self.customer_leaves(customer, current_time)
+
+            # Update the seat and departure time of the empty seat number and give the seat back
+            self.seats[seat_number] = None
+            self.departure_times[seat_number] = float('inf')
+            self.free_seat_stack.append(seat_number)
+            # Update the relevant statistics
+            self.free_seats += 1
+            self.total_customers_served += 1
+            customers_served += 1
+
+        # Return the number of customers served in the current timestep
+        return customers_served
+
+
+# Event-calendar implementations that a Simulation can be run with
+BUS_CALENDARS = {'list': Bus, 'heap': HeapBus}
@@ -1,28 +1,32 @@
 from collections import deque
-from helpers.customer import Customer
 
 """File containing BusStop class for our simulation"""
 
 class BusStop:
     def __init__(self):
-        """This class takes care of keeping track of the queue in our system"""
+        """This class takes care of keeping track of the queue (of customer ids) in our system. Customers who leave
+        the queue early are removed lazily: they are only counted as abandoned, and skipped when they reach the front
+        of the queue, so that abandonments cost O(1) however long the queue"""
 
         # Number of customers in the queue presently
         self.customers = 0
         # Create an instance of a queue
         self.queue = deque()
+        # Number of entries of each customer id that are still in the queue although the customer left it
+        self.abandoned = {}
 
-    def customer_arrives(self, customer: Customer):
+    def customer_arrives(self, customer: int):
         """This function adds the newly arrived customer to the queue"""
 
         self.queue.append(customer)
         # Updated the number of customers in the queue
         self.customers += 1
 
-    def customer_balks(self, customer: Customer):
-        """This function removes the customer from the queue if they balk"""
+    def customer_balks(self, customer: int):
+        """This function removes the customer from the queue if they balk or renege (they must be in the queue)"""
 
-        self.queue.remove(customer)
+        # Counts rather than a set, as the id of a customer who left may be reused by a later arrival that leaves too
+        self.abandoned[customer] = self.abandoned.get(customer, 0) + 1
         # Updated the number of customers in the queue
         self.customers -= 1
 
@@ -30,9 +34,33 @@ class BusStop:
         """This function removes the customer from the queue if they are being served"""
 
         # If there is presently a queue
-        if self.queue:
+        if self.customers:
             # Remove a customer from the queue
             self.customers -= 1
 
-            # Return the first customer in the queue (FIFO)
-            return self.queue.popleft()
\ No newline at end of file
+            # Return the first customer in the queue (FIFO), skipping the ones who left. Entries of a reused id are
+            # in order of arrival, so the ones who left always come first
+            while True:
+                customer = self.queue.popleft()
+
+                if customer not in self.abandoned:
+                    return customer
+
+                self.abandoned[customer] -= 1
+
+                if not self.abandoned[customer]:
+                    del self.abandoned[customer]
+
+    def waiting_customers(self):
+        """This function returns the ids of the customers in the queue, in order"""
+
+        abandoned = dict(self.abandoned)
+        customers = []
+
+        for customer in self.queue:
+            if abandoned.get(customer):
+                abandoned[customer] -= 1
+            else:
+                customers.append(customer)
+
+        return customers
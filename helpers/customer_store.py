@@ -0,0 +1,172 @@
+from typing import Dict
+import numpy as np
+
+"""File containing the CustomerStore class for our simulation"""
+
+class CustomerStore:
+    def __init__(
+        self, capacity: int = 1024, recycle: bool = False, verbose: bool = False, weighted: bool = False,
+        abandonment: bool = False, classified: bool = False):
+
+        """This class keeps the times of every customer in preallocated arrays indexed by customer id, instead of one
+        object per customer. With recycle, the id of a served customer is reused by a later arrival, so memory is
+        bounded by the number of customers in the system rather than by the length of the run. With weighted, the
+        store also keeps the importance sampling log-likelihood ratio of each customer (see Simulation), with
+        abandonment whether each customer balked or reneged, and with classified the class of each customer"""
+
+        capacity = max(int(capacity), 1)
+        # Time of arrival of each customer in the system
+        self.arrival_times = np.full(capacity, float('inf'))
+        # Time of entering the bus for each customer in the system
+        self.boarded_times = np.full(capacity, float('inf'))
+        # Time of being served for each customer in the system
+        self.departure_times = np.full(capacity, float('inf'))
+        # Number of people in system at time of arrival of each customer
+        self.system_customers = np.zeros(capacity, dtype = np.int64)
+        # Log-likelihood ratio of the run when each customer boarded the bus, under importance sampling
+        self.log_likelihood_ratios = np.zeros(capacity) if weighted else None
+        # Whether each customer left without boarding, when customers can balk or renege
+        self.abandoned = np.zeros(capacity, dtype = bool) if abandonment else None
+        # Class of each customer, -1 until they board the bus
+        self.customer_classes = np.full(capacity, -1, dtype = np.int64) if classified else None
+
+        # Number of ids handed out so far
+        self.count = 0
+        self.recycle = recycle
+        # Ids of served customers that can be reused when recycling
+        self.free_ids = []
+
+        self.verbose = verbose
+
+    def _grow(self):
+        """This function doubles the capacity of the store"""
+
+        capacity = len(self.arrival_times)
+
+        self.arrival_times = np.concatenate([self.arrival_times, np.full(capacity, float('inf'))])
+        self.boarded_times = np.concatenate([self.boarded_times, np.full(capacity, float('inf'))])
+        self.departure_times = np.concatenate([self.departure_times, np.full(capacity, float('inf'))])
+        self.system_customers = np.concatenate([self.system_customers, np.zeros(capacity, dtype = np.int64)])
+
+        if self.log_likelihood_ratios is not None:
+            self.log_likelihood_ratios = np.concatenate([self.log_likelihood_ratios, np.zeros(capacity)])
+
+        if self.abandoned is not None:
+            self.abandoned = np.concatenate([self.abandoned, np.zeros(capacity, dtype = bool)])
+
+        if self.customer_classes is not None:
+            self.customer_classes = np.concatenate([self.customer_classes, np.full(capacity, -1, dtype = np.int64)])
+
+    def add(self, birth_time: float, system_customers: int) -> int:
+        """This function stores a newly arrived customer and returns their id"""
+
+        if self.free_ids:
+            customer = self.free_ids.pop()
+            self.boarded_times[customer] = float('inf')
+            self.departure_times[customer] = float('inf')
+
+            if self.abandoned is not None:
+                self.abandoned[customer] = False
+
+            if self.customer_classes is not None:
+                self.customer_classes[customer] = -1
+        else:
+            if self.count == len(self.arrival_times):
+                self._grow()
+
+            customer = self.count
+            self.count += 1
+
+        self.arrival_times[customer] = birth_time
+        self.system_customers[customer] = system_customers
+
+        return customer
+
+    def board_bus(self, customer: int, boarding_time: float):
+        """This function notes down the time the customer boards the bus"""
+
+        if self.verbose:
+            print("Customer boards bus.")
+
+        self.boarded_times[customer] = boarding_time
+
+    def weigh(self, customer: int, log_likelihood_ratio: float):
+        """This function notes down the log-likelihood ratio of the run when the customer boards the bus"""
+
+        self.log_likelihood_ratios[customer] = log_likelihood_ratio
+
+    def assign_class(self, customer: int, customer_class: int):
+        """This function notes down the class of the customer"""
+
+        self.customer_classes[customer] = customer_class
+
+    def abandon(self, customer: int):
+        """This function notes down that the customer left without boarding the bus"""
+
+        if self.verbose:
+            print("Customer abandons the queue.")
+
+        self.abandoned[customer] = True
+
+    def alight_bus(self, customer: int, departure_time: float):
+        """This function notes down the time the customer leaves the bus"""
+
+        if self.verbose:
+            print("Customer alights bus.")
+
+        self.departure_times[customer] = departure_time
+
+    def release(self, customer: int):
+        """This function lets a later arrival reuse the id of a served (or abandoning) customer when recycling"""
+
+        if self.recycle:
+            self.free_ids.append(customer)
+
+    def calculate_stats(self, customer: int) -> Dict:
+        """This function returns all the relevant statistics for the customer while they were in the system"""
+
+        arrival_time = float(self.arrival_times[customer])
+        boarded_time = float(self.boarded_times[customer])
+        departure_time = float(self.departure_times[customer])
+
+        return {
+                'arrival_time'  : arrival_time,
+                'boarded_time'  : boarded_time,
+                'departure_time': departure_time,
+                'waiting_time'  : boarded_time - arrival_time,
+                'serving_time'  : departure_time - boarded_time,
+                'time_in_system': departure_time - arrival_time,
+                'customers_upon_arrival': int(self.system_customers[customer]),
+                }
+
+    def get_history(self, customers = None) -> Dict[str, np.ndarray]:
+        """This function returns the statistics of the stored customers (or of the given ids) as columns. Without ids,
+        the time and customers_upon_arrival columns are views on the store rather than copies"""
+
+        selection = slice(0, self.count) if customers is None else np.asarray(customers, dtype = np.int64)
+        arrival_times = self.arrival_times[selection]
+        boarded_times = self.boarded_times[selection]
+        departure_times = self.departure_times[selection]
+
+        # Customers still in the system have infinite times, and inf - inf is nan as in calculate_stats
+        with np.errstate(invalid = 'ignore'):
+            history = {
+                    'arrival_time'  : arrival_times,
+                    'boarded_time'  : boarded_times,
+                    'departure_time': departure_times,
+                    'waiting_time'  : boarded_times - arrival_times,
+                    'serving_time'  : departure_times - boarded_times,
+                    'time_in_system': departure_times - arrival_times,
+                    'customers_upon_arrival': self.system_customers[selection],
+                    }
+
+        if self.log_likelihood_ratios is not None:
+            history['log_likelihood_ratio'] = self.log_likelihood_ratios[selection]
+
+        if self.abandoned is not None:
+            history['abandoned'] = self.abandoned[selection]
+
+        if self.customer_classes is not None:
+            history['customer_class'] = self.customer_classes[selection]
+
+        return history
@@ -0,0 +1,34 @@
+import heapq
+
+"""File containing the EventQueue class, the event scheduler of the network simulation"""
+
+class EventQueue:
+    def __init__(self):
+        """This class is a priority queue of future events, kept as a min-heap of (time, priority, sequence, kind,
+        payload) so that scheduling and taking the next event cost O(log events) whatever the number of stops and
+        buses. Events at the same time are taken by priority (lowest first), then in the order they were scheduled"""
+
+        self.heap = []
+        # Number of events scheduled so far, which breaks ties between events of the same time and priority
+        self.sequence = 0
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def schedule(self, time: float, kind: str, payload = None, priority: int = 0):
+        """This function schedules an event of the given kind at the given time"""
+
+        heapq.heappush(self.heap, (time, priority, self.sequence, kind, payload))
+        self.sequence += 1
+
+    def pop(self):
+        """This function removes the next event and returns its (time, kind, payload)"""
+
+        time, _, _, kind, payload = heapq.heappop(self.heap)
+
+        return time, kind, payload
+
+    def peek_time(self) -> float:
+        """This function returns the time of the next event (infinite when there is none)"""
+
+        return self.heap[0][0] if self.heap else float('inf')
@@ -0,0 +1,240 @@
+from typing import List, Sequence, Union
+import numpy as np
+from helpers.bus_stop import BusStop
+from helpers.customer_store import CustomerStore
+from helpers.event_queue import EventQueue
+from helpers.statistics import TimeWeightedStatistic
+from helpers.variate_stream import VariateStream
+
+"""File containing the Network class, which simulates a bus route with many stops and buses"""
+
+# Kinds of events, with the priority of events at the same time: buses are handled before passengers arrive
+BUS_ARRIVAL, DISPATCH, PASSENGER_ARRIVAL = 'bus_arrival', 'dispatch', 'passenger_arrival'
+PRIORITIES = {BUS_ARRIVAL: 0, DISPATCH: 1, PASSENGER_ARRIVAL: 2}
+
+
+class RouteBus:
+    def __init__(self, number: int, seats: int):
+        """This class is a bus travelling along the route. Riders are grouped by the stop they get off at, so that
+        a stop only touches the customers alighting there"""
+
+        self.number = number
+        self.free_seats = seats
+        # Customer ids on board, by stop of destination
+        self.riders = {}
+
+    def board(self, customer: int, destination: int):
+        """This function seats a customer until their destination"""
+
+        self.riders.setdefault(destination, []).append(customer)
+        self.free_seats -= 1
+
+    def alight(self, stop: int) -> List[int]:
+        """This function lets off and returns the customers whose destination is the stop"""
+
+        customers = self.riders.pop(stop, [])
+        self.free_seats += len(customers)
+
+        return customers
+
+
+class Network:
+    def __init__(
+        self, bus_seats: int, route_stops: int, arrival_times: Sequence[Union[List[float], VariateStream]],
+        ride_lengths: Sequence[Union[List[int], VariateStream]], headway: float,
+        travel_times: Union[float, Sequence[float]] = 1.0, boarding_time: float = 0.0, buses: int = None,
+        verbose: bool = False):
+
+        """This class simulates a bus route of route_stops stops: a bus with bus_seats seats leaves the first stop
+        every headway (up to buses buses), and takes travel_times[stop] to go from a stop to the next one. Passengers
+        arrive at every stop but the last one at the given absolute arrival_times, each with its own queue (BusStop),
+        and ride the number of stops given by ride_lengths (at least one, as riders only get off at a later stop, and
+        capped at the end of the route). A bus at a stop first
+        lets off its riders, then boards the queue in FIFO order while it has free seats, dwelling boarding_time per
+        boarding passenger. The inputs of each stop can be lists or VariateStreams.
+
+        Every stop and bus has at most one pending event in a single EventQueue, so an event costs O(log(stops +
+        buses)) plus the passengers it moves, without scanning the other stops or buses"""
+
+        if route_stops < 2:
+            raise ValueError("A route needs at least 2 stops")
+
+        if len(arrival_times) != route_stops - 1 or len(ride_lengths) != route_stops - 1:
+            raise ValueError(f"Expected arrival times and ride lengths for each of the first {route_stops - 1} stops")
+
+        # Hyper-parameters
+        self.BUS_SEATS = bus_seats
+        self.ROUTE_STOPS = route_stops
+        self.HEADWAY = headway
+        self.TRAVEL_TIMES = np.broadcast_to(np.asarray(travel_times, dtype = float), (route_stops - 1,)).tolist()
+        self.BOARDING_TIME = boarding_time
+        self.BUSES = float('inf') if buses is None else buses
+
+        # Simulation Variables
+        self.arrival_times = arrival_times
+        self.ride_lengths = ride_lengths
+        self.available_arrival_times = [
+            float('inf') if isinstance(times, VariateStream) else len(times) for times in arrival_times]
+
+        # System time and the scheduler of every future event
+        self.time = 0
+        self.events = EventQueue()
+
+        # Times of every passenger, with the stops they board and alight at
+        self.customers = CustomerStore(verbose = verbose)
+        self.origins = []
+        self.destinations = []
+        # Queue of each stop, and its length over time
+        self.stops = [BusStop() for _ in range(route_stops)]
+        self.queue_lengths = [TimeWeightedStatistic() for _ in range(route_stops)]
+
+        # Keep track of system statistics
+        self.stop_arrivals = [0] * route_stops
+        self.total_arrivals = 0
+        self.total_boarded = 0
+        self.total_served = 0
+        self.buses_dispatched = 0
+        # Passengers still queueing when a full bus leaves their stop, counted once per bus
+        self.left_behind = 0
+        self.verbose = verbose
+
+        # Get the first Events in the system
+        self.schedule(0, DISPATCH)
+
+        for stop in range(route_stops - 1):
+            if self.available_arrival_times[stop]:
+                self.schedule(arrival_times[stop][0], PASSENGER_ARRIVAL, stop)
+
+    def schedule(self, time: float, kind: str, payload = None):
+        """This function schedules an event with the priority of its kind"""
+
+        self.events.schedule(time, kind, payload, PRIORITIES[kind])
+
+    def time_step(self):
+        """This function moves the simulation forward to the next event"""
+
+        self.time, kind, payload = self.events.pop()
+
+        if kind == PASSENGER_ARRIVAL:
+            self.passenger_arrives(payload)
+        elif kind == BUS_ARRIVAL:
+            self.bus_arrives(*payload)
+        else:
+            self.dispatch_bus()
+
+    def run(self, time_limit: float):
+        """This function simulates every event before time_limit, which must be finite when buses keep being sent or
+        passengers keep arriving from streams"""
+
+        unbounded = self.BUSES == float('inf') or float('inf') in self.available_arrival_times
+
+        if unbounded and time_limit == float('inf'):
+            raise ValueError("Runs with unlimited buses or streamed arrivals need a finite time limit")
+
+        while self.events.peek_time() < time_limit:
+            self.time_step()
+
+    def passenger_arrives(self, stop: int):
+        """This function queues a passenger arriving at the stop and schedules the next arrival there"""
+
+        bus_stop = self.stops[stop]
+        index = self.stop_arrivals[stop]
+        customer = self.customers.add(self.time, bus_stop.customers)
+        self.origins.append(stop)
+        # A bus lets riders off before boarding, so a ride of 0 stops would never end
+        ride_length = max(int(self.ride_lengths[stop][index]), 1)
+        self.destinations.append(min(stop + ride_length, self.ROUTE_STOPS - 1))
+
+        bus_stop.customer_arrives(customer)
+        self.queue_lengths[stop].update(self.time, bus_stop.customers)
+
+        if self.verbose:
+            print(f"Passenger arrives at stop {stop}.")
+
+        # Update system statistics
+        self.stop_arrivals[stop] += 1
+        self.total_arrivals += 1
+
+        if index + 1 < self.available_arrival_times[stop]:
+            self.schedule(self.arrival_times[stop][index + 1], PASSENGER_ARRIVAL, stop)
+
+    def dispatch_bus(self):
+        """This function sends a new bus from the first stop and schedules the next one a headway later"""
+
+        bus = RouteBus(self.buses_dispatched, self.BUS_SEATS)
+        self.buses_dispatched += 1
+
+        if self.verbose:
+            print(f"Bus {bus.number} leaves the depot.")
+
+        self.bus_arrives(bus, 0)
+
+        if self.buses_dispatched < self.BUSES:
+            self.schedule(self.time + self.HEADWAY, DISPATCH)
+
+    def bus_arrives(self, bus: RouteBus, stop: int):
+        """This function lets the riders of the bus off at the stop, boards the queue, and sends the bus on"""
+
+        for customer in bus.alight(stop):
+            self.customers.alight_bus(customer, self.time)
+            self.total_served += 1
+
+        if stop == self.ROUTE_STOPS - 1:
+            # End of the route
+            return
+
+        bus_stop = self.stops[stop]
+        boarded = 0
+
+        # Get customers into the bus while there are free seats (FIFO)
+        while bus.free_seats > 0 and bus_stop.customers > 0:
+            customer = bus_stop.serve_customer()
+            self.customers.board_bus(customer, self.time)
+            bus.board(customer, self.destinations[customer])
+            boarded += 1
+
+        if boarded:
+            self.queue_lengths[stop].update(self.time, bus_stop.customers)
+
+        # Update system statistics
+        self.total_boarded += boarded
+        self.left_behind += bus_stop.customers if bus.free_seats == 0 else 0
+
+        if self.verbose:
+            print(f"Bus {bus.number} boards {boarded} at stop {stop}, leaving {bus_stop.customers} behind.")
+
+        dwell_time = self.BOARDING_TIME * boarded
+        self.schedule(self.time + dwell_time + self.TRAVEL_TIMES[stop], BUS_ARRIVAL, (bus, stop + 1))
+
+    def calculate_statistics(self, time_limit: float = None):
+        """This function returns the statistics of the run: the average waiting and riding times of the passengers
+        who boarded, the time-average queue length of every stop (up to time_limit, by default the current time) and
+        their mean over the stops where passengers arrive, and counts of passengers and buses"""
+
+        end_time = self.time if time_limit is None or not np.isfinite(time_limit) else time_limit
+        history = self.customers.get_history()
+        boarded = np.isfinite(history['boarded_time'])
+        served = np.isfinite(history['departure_time'])
+
+        stop_queue_lengths = []
+
+        for queue_length in self.queue_lengths[:-1]:
+            # Close the time average at the end of the run
+            queue_length.update(max(end_time, queue_length.last_time), queue_length.last_value)
+            stop_queue_lengths.append(queue_length.mean)
+
+        arrived = len(history['arrival_time']) > 0
+
+        with np.errstate(invalid = 'ignore'):
+            return {
+                'average_waiting_time': np.mean(history['waiting_time'][boarded]) if boarded.any() else np.nan,
+                'average_riding_time': np.mean(history['serving_time'][served]) if served.any() else np.nan,
+                'average_queue_length': np.nanmean(stop_queue_lengths) if stop_queue_lengths else np.nan,
+                'average_customers_upon_arrival': np.mean(history['customers_upon_arrival']) if arrived else np.nan,
+                'stop_queue_lengths': stop_queue_lengths,
+                'arrivals': self.total_arrivals,
+                'boarded': self.total_boarded,
+                'served': self.total_served,
+                'left_behind': self.left_behind,
+                'buses_dispatched': self.buses_dispatched,
+            }
@@ -0,0 +1,137 @@
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List
+from helpers.statistics import TimeWeightedStatistic
+
+"""File containing the SimulationProfile class, which instruments where the time of a simulation goes"""
+
+class SimulationProfile:
+    def __init__(self):
+        """This class accumulates optional instrumentation of simulations: wall-clock time per phase (sampling,
+        event_loop and aggregation, with the event loop further split into arrivals and departures for the object
+        engine), numbers of events (arrivals, departures and reneges), the high-water mark of the queue and the utilisation of the seats. Profiles of
+        several runs can be combined with aggregate"""
+
+        # Wall-clock seconds spent in each phase
+        self.phase_seconds = {}
+        # Number of events processed by the event loop, in total and by type
+        self.events = 0
+        self.arrival_events = 0
+        self.departure_events = 0
+        self.renege_events = 0
+        # Number of runs the profile covers
+        self.runs = 0
+
+        # Longest queue seen, and simulated time covered by the runs
+        self.queue_high_water_mark = 0
+        self.simulated_time = 0.0
+        # Seat-time spent serving customers, and seat-time available
+        self.busy_seat_time = 0.0
+        self.seat_time = 0.0
+
+        # Number of busy seats over time in the current run
+        self.busy_seats = None
+        self.seats = 0
+
+    @contextmanager
+    def phase(self, name: str):
+        """This function times the code run inside the context as the given phase"""
+
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name: str, seconds: float):
+        """This function adds wall-clock time to a phase"""
+
+        self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + seconds
+
+    def start_run(self, seats: int):
+        """This function starts recording a new run on a bus with the given number of seats"""
+
+        self.runs += 1
+        self.seats = seats
+        self.busy_seats = TimeWeightedStatistic()
+
+    def record_event(
+        self, current_time: float, arrival: bool, queue_length: int, busy_seats: int, renege: bool = False):
+
+        """This function records an event of the current run (an arrival, a departure or with renege a customer
+        leaving the queue) and the state of the system after it"""
+
+        self.events += 1
+
+        if arrival:
+            self.arrival_events += 1
+        elif renege:
+            self.renege_events += 1
+        else:
+            self.departure_events += 1
+
+        if queue_length > self.queue_high_water_mark:
+            self.queue_high_water_mark = queue_length
+
+        if current_time < float('inf'):
+            self.busy_seats.update(current_time, busy_seats)
+
+    def end_run(self):
+        """This function adds the seat utilisation of the current run to the profile"""
+
+        elapsed = self.busy_seats.last_time - self.busy_seats.start_time
+        self.simulated_time += elapsed
+        self.busy_seat_time += self.busy_seats.area
+        self.seat_time += self.seats * elapsed
+        self.busy_seats = None
+
+    @classmethod
+    def aggregate(cls, profiles: List['SimulationProfile']) -> 'SimulationProfile':
+        """This function combines the profiles of several runs, e.g. of every replication of a sweep"""
+
+        total = cls()
+
+        for profile in profiles:
+
+            for name, seconds in profile.phase_seconds.items():
+                total.add_time(name, seconds)
+
+            total.events += profile.events
+            total.arrival_events += profile.arrival_events
+            total.departure_events += profile.departure_events
+            total.renege_events += profile.renege_events
+            total.runs += profile.runs
+            total.queue_high_water_mark = max(total.queue_high_water_mark, profile.queue_high_water_mark)
+            total.simulated_time += profile.simulated_time
+            total.busy_seat_time += profile.busy_seat_time
+            total.seat_time += profile.seat_time
+
+        return total
+
+    def to_dict(self) -> Dict:
+        """This function returns the profile as a dictionary, with the event rate of the event loop and the mean seat
+        utilisation (busy seat-time over available seat-time, only known for the object engine)"""
+
+        event_loop_seconds = self.phase_seconds.get('event_loop', 0.0)
+        # Events are only counted by the object engine
+        counted = self.events > 0 and event_loop_seconds > 0
+
+        return {
+            'runs': self.runs,
+            'phase_seconds': dict(self.phase_seconds),
+            'events': self.events,
+            'arrival_events': self.arrival_events,
+            'departure_events': self.departure_events,
+            'renege_events': self.renege_events,
+            'events_per_second': self.events / event_loop_seconds if counted else float('nan'),
+            'queue_high_water_mark': self.queue_high_water_mark,
+            'simulated_time': self.simulated_time,
+            'seat_utilisation': self.busy_seat_time / self.seat_time if self.seat_time > 0 else float('nan'),
+        }
+
+
+def profile_phase(profile: SimulationProfile, name: str):
+    """This function times a phase in the profile, or does nothing without a profile"""
+
+    return profile.phase(name) if profile is not None else nullcontext()
@@ -1,7 +1,12 @@
-from typing import List
-from helpers.customer import Customer
+import heapq
+import time
+from typing import List, Tuple, Union
+from helpers.customer_store import CustomerStore
 from helpers.bus_stop import BusStop
-from helpers.bus import Bus
+from helpers.bus import BUS_CALENDARS
+from helpers.statistics import StreamingStatistics
+from helpers.variate_stream import VariateStream
+from helpers.profile import SimulationProfile
 
 """File containing the Simulation object class for our simulation"""
 
@@ -9,9 +14,48 @@ class Simulation:
 
     def __init__(
         self, bus_seats: int, bus_stops: int, 
-        interarrival_times: List[float], serving_times: List[float],
-        verbose: bool = False):
-        """This class is responsible for managing the simulation of our system and keeping track of states and events"""
+        interarrival_times: Union[List[float], VariateStream], serving_times: Union[List[float], VariateStream],
+        verbose: bool = False, event_calendar: str = 'list', streaming: bool = False,
+        batch_size: int = None, log_likelihood_ratios: Tuple[List[float], List[float]] = None,
+        profile: SimulationProfile = None, arrival_times: Union[List[float], VariateStream] = None,
+        balking_threshold: int = None, patience_times: Union[List[float], VariateStream] = None,
+        serving_classes: List[int] = None):
+        """This class is responsible for managing the simulation of our system and keeping track of states and events
+
+        event_calendar chooses how the bus keeps track of departures: 'list' scans every seat on each event while
+        'heap' keeps an indexed min-heap of departures, which is much faster for buses with many seats.
+
+        With streaming, the statistics are accumulated online in self.statistics instead of keeping the history of
+        every served customer, so memory doesn't grow with the length of the run. A batch_size additionally keeps
+        the batch means of the waiting time and queue length (see StreamingStatistics)
+
+        The interarrival and serving times can be VariateStreams instead of lists, which draw them on demand: arrivals
+        then never run out, so the run can be bounded by simulated time alone, and with streaming its memory stays
+        constant however long it is.
+
+        For importance sampling, log_likelihood_ratios gives the log-likelihood ratio (nominal over sampling density)
+        of every interarrival and serving time. The simulation adds them up in self.log_likelihood_ratio as the times
+        are used, and the customer store keeps its value when each customer boards.
+
+        With a profile, every event is timed and counted in it along with the queue length and busy seats (see
+        SimulationProfile); the caller ends the run with profile.end_run()
+
+        arrival_times gives the absolute times of the arrivals instead of interarrival_times, e.g. for an arrival
+        process whose rate varies with the time of day. The customers then arrive exactly at those times, whereas
+        interarrival times use the first one for both the first and second arrival
+
+        Customers can abandon the system: with a balking_threshold, an arrival who finds no free seat and at least
+        that many customers in the system leaves at once, and with patience_times (one per arrival), a customer who
+        is still queueing patience_times[i] after arriving reneges. Abandoning customers are removed from the queue
+        lazily (see BusStop) and their renege times kept in a min-heap, so abandonments cost O(log queue)
+
+        serving_classes gives the customer class of every serving time (e.g. of customer classes with their own
+        serving time distributions). As serving times are used in boarding order, a customer's class is recorded in
+        the customer store when they board, from the class of the serving time they get
+        """
+
+        if event_calendar not in BUS_CALENDARS:
+            raise ValueError(f"Unknown event calendar {event_calendar!r}, expected one of {list(BUS_CALENDARS)}")
 
         # Hyper-parameters
         # Number of seats on a bus (servers)
@@ -22,25 +66,72 @@ class Simulation:
         # Simulation Variables
         self.interarrival_times = interarrival_times
         self.serving_times = serving_times
+        self.arrival_times = arrival_times
+        # Number of times available (streams never run out)
+        arrivals = interarrival_times if arrival_times is None else arrival_times
+        self.available_interarrival_times = float('inf') if isinstance(arrivals, VariateStream) else len(arrivals)
+        self.available_serving_times = float('inf') if isinstance(serving_times, VariateStream) else len(serving_times)
 
         # System time
         self.time = 0
 
+        # Times of every customer, indexed by customer id (ids are reused when streaming). The store is preallocated
+        # for the whole run up to a bound (streams are unbounded), beyond which it grows as needed
+        self.customers = CustomerStore(
+            capacity = min(self.available_interarrival_times, 1024 if streaming else 2 ** 16),
+            recycle = streaming, verbose = verbose, weighted = log_likelihood_ratios is not None,
+            abandonment = balking_threshold is not None or patience_times is not None,
+            classified = serving_classes is not None)
         # Instance of a queue of customers
         self.busStop = BusStop()
+        # Online accumulators of the system statistics
+        self.statistics = StreamingStatistics(batch_size) if streaming else None
         # Instance of a set of servers
-        self.bus = Bus(seats = self.BUS_SEATS, verbose = verbose)
+        self.bus = BUS_CALENDARS[event_calendar](
+            seats = self.BUS_SEATS, customers = self.customers, verbose = verbose, statistics = self.statistics)
 
         # Keep track of system statistics
         self.total_arrivals = 0
         self.total_boarded = 0
         self.total_served = 0
         self.system_customers = 0
+        self.total_balked = 0
+        self.total_reneged = 0
         self.verbose = verbose
-        self.customer_history = []
+
+        # Abandonment of the queue
+        self.BALKING_THRESHOLD = balking_threshold
+        self.patience_times = patience_times
+        self.available_patience_times = (
+            0 if patience_times is None else
+            float('inf') if isinstance(patience_times, VariateStream) else len(patience_times))
+        # Min-heap of (renege time, arrival number, customer) of the queueing customers, which may hold customers who
+        # boarded since (see purge_reneges), and the arrival number of every queueing customer by id
+        self.reneges = []
+        self.waiting = {}
+
+        # Class of every serving time, in boarding order
+        self.serving_classes = serving_classes
+
+        # Importance sampling weights of the times used so far
+        self.interarrival_log_likelihood_ratios, self.serving_log_likelihood_ratios = (
+            log_likelihood_ratios if log_likelihood_ratios is not None else (None, None))
+        self.log_likelihood_ratio = 0.0
+        # Number of interarrival and serving times already weighted, as some are looked up more than once
+        self.weighted_interarrivals = 0
+        self.weighted_servings = 0
+
+        # Optional instrumentation of the event loop
+        self.profile = profile
+
+        if profile is not None:
+            profile.start_run(bus_seats)
 
         # Get the next Events in the system
-        self.time_to_next_arrival = self.generate_next_arrival()
+        if arrival_times is not None:
+            self.time_to_next_arrival = arrival_times[0] if self.available_interarrival_times else float('inf')
+        else:
+            self.time_to_next_arrival = self.generate_next_arrival()
         self.time_to_next_departure = float('inf')
 
     def calculate_statistics(self):
@@ -54,18 +145,61 @@ class Simulation:
                 }
 
     def get_customer_history(self):
-        """This function returns the customer history of all the customers served by the bus"""
+        """This function returns the customer history of all the customers who arrived, as columns of the customer
+        store (only the customers still in the system when streaming, as served customers are then only kept in the
+        statistics)"""
+
+        if self.statistics is not None:
+            return self.customers.get_history(
+                [customer for customer in self.bus.seats if customer is not None] + self.busStop.waiting_customers())
 
-        return self.bus.customer_history + [customer.calculate_stats() for customer in self.bus.seats if customer is
-                                            not None] + [customer.calculate_stats() for customer in self.busStop.queue]
+        return self.customers.get_history()
 
     def generate_next_arrival(self):
         """This function generates the next arrival time for a customer"""
-        return self.time + self.interarrival_times[self.total_arrivals] if self.total_arrivals < (len(self.interarrival_times)-1) else float('inf')
+
+        if self.arrival_times is not None:
+            # The arriving customer isn't counted in total_arrivals yet
+            next_arrival = self.total_arrivals + 1
+
+            if next_arrival < self.available_interarrival_times:
+                return self.arrival_times[next_arrival]
+
+            return float('inf')
+
+        # Weigh each interarrival time the first time it is used (the first one is used twice)
+        if (self.interarrival_log_likelihood_ratios is not None
+                and self.weighted_interarrivals <= self.total_arrivals < self.available_interarrival_times - 1):
+            self.log_likelihood_ratio += self.interarrival_log_likelihood_ratios[self.total_arrivals]
+            self.weighted_interarrivals = self.total_arrivals + 1
+
+        return self.time + self.interarrival_times[self.total_arrivals] if self.total_arrivals < (self.available_interarrival_times-1) else float('inf')
 
     def generate_serving_time(self):
         """This function generates the next departure time for a customer"""
-        return self.time + self.serving_times[self.total_boarded] if self.total_boarded < len(self.serving_times) else float('inf') 
+
+        # Weigh each serving time the first time it is looked up (arrivals that queue look it up without using it)
+        if (self.serving_log_likelihood_ratios is not None
+                and self.weighted_servings <= self.total_boarded < self.available_serving_times):
+            self.log_likelihood_ratio += self.serving_log_likelihood_ratios[self.total_boarded]
+            self.weighted_servings = self.total_boarded + 1
+
+        return self.time + self.serving_times[self.total_boarded] if self.total_boarded < self.available_serving_times else float('inf') 
+
+    def purge_reneges(self) -> float:
+        """This function drops the customers who boarded since they queued from the top of the renege heap, and
+        returns the next time a customer reneges"""
+
+        while self.reneges:
+            _, arrival_number, customer = self.reneges[0]
+
+            # The customer is still queueing (an id is only reused after its customer left)
+            if self.waiting.get(customer) == arrival_number:
+                return self.reneges[0][0]
+
+            heapq.heappop(self.reneges)
+
+        return float('inf')
 
     def time_step(self):
         """This function moves the simulation forward to the next step"""
@@ -73,10 +207,20 @@ class Simulation:
         # Either a new customer arrives or an existing customer leaves after being served
         time_to_next_event = min(self.time_to_next_arrival, self.time_to_next_departure)
 
+        # Or a queueing customer runs out of patience first
+        if self.reneges and self.purge_reneges() < time_to_next_event:
+            self.time = self.reneges[0][0]
+            self.customer_reneges()
+            return
+
         # Update the system clock
         self.time = time_to_next_event
+        arrival = self.time_to_next_arrival < self.time_to_next_departure
+
+        if self.profile is not None:
+            start = time.perf_counter()
 
-        if self.time_to_next_arrival < self.time_to_next_departure:
+        if arrival:
 
             if self.verbose:
                 print("New customer arrives!")
@@ -97,11 +241,66 @@ class Simulation:
                 print(self.total_arrivals)
                 print(self.total_served)
 
+        if self.statistics is not None:
+            self.statistics.record_event(self.time, self.busStop.customers)
+
+        if self.profile is not None:
+            self.profile.add_time('arrivals' if arrival else 'departures', time.perf_counter() - start)
+            self.profile.record_event(
+                self.time, arrival, self.busStop.customers, self.BUS_SEATS - self.bus.free_seats)
+
+    def customer_reneges(self):
+        """This function takes care of when a queueing customer runs out of patience and leaves"""
+
+        if self.profile is not None:
+            start = time.perf_counter()
+
+        if self.verbose:
+            print("Customer runs out of patience :(")
+
+        _, _, customer = heapq.heappop(self.reneges)
+        del self.waiting[customer]
+        self.busStop.customer_balks(customer)
+        self.customers.abandon(customer)
+        self.customers.release(customer)
+
+        # Update system statistics
+        self.total_reneged += 1
+        self.system_customers -= 1
+
+        if self.statistics is not None:
+            self.statistics.record_event(self.time, self.busStop.customers)
+
+        if self.profile is not None:
+            self.profile.add_time('reneging', time.perf_counter() - start)
+            self.profile.record_event(
+                self.time, False, self.busStop.customers, self.BUS_SEATS - self.bus.free_seats, renege = True)
+
     def customer_arrives(self):
         """This function takes care of when a customer is added to the queue after arriving"""
 
-        # Create a new customer instance at the current time
-        customer = Customer(self.time, self.system_customers, self.verbose)
+        # Store a new customer arriving at the current time
+        customer = self.customers.add(self.time, self.system_customers)
+
+        if self.statistics is not None:
+            self.statistics.record_arrival(self.system_customers)
+
+        # The customer leaves at once if there is no free seat and too many customers in the system
+        if (self.BALKING_THRESHOLD is not None and self.bus.free_seats == 0
+                and self.system_customers >= self.BALKING_THRESHOLD):
+
+            if self.verbose:
+                print("Customer balks at the queue.")
+
+            self.customers.abandon(customer)
+            self.customers.release(customer)
+            self.time_to_next_arrival = self.generate_next_arrival()
+
+            # Update system statistics
+            self.total_arrivals += 1
+            self.total_balked += 1
+            return
+
         # Find the time that it will take to serve the newly arrived customer
         serving_time = self.generate_serving_time()
 
@@ -110,7 +309,7 @@ class Simulation:
 
             # Add the customer to the bus
             self.bus.customer_boards(customer, self.time, serving_time)
-            self.total_boarded += 1
+            self.customer_boarded(customer)
             # Update the next time that a customer is going to be served
             self.time_to_next_departure = self.bus.get_next_departure_time()
 
@@ -119,6 +318,13 @@ class Simulation:
             # Add the customer to the queue
             self.busStop.customer_arrives(customer)
 
+            # Note down when the customer runs out of patience
+            if self.total_arrivals < self.available_patience_times:
+                heapq.heappush(
+                    self.reneges,
+                    (self.time + self.patience_times[self.total_arrivals], self.total_arrivals, customer))
+                self.waiting[customer] = self.total_arrivals
+
         # Find the next time that a customer is going to be arriving in the system
         self.time_to_next_arrival = self.generate_next_arrival()
 
@@ -136,13 +342,26 @@ class Simulation:
         self.system_customers -= served
 
         # While there are available seats on the bus and there is a queue
-        while self.bus.free_seats > 0 and self.busStop.queue:
+        while self.bus.free_seats > 0 and self.busStop.customers > 0:
 
             # Get customers into the bus and find their serving times (FIFO)
             customer = self.busStop.serve_customer()
+            self.waiting.pop(customer, None)
             serving_time = self.generate_serving_time()
             self.bus.customer_boards(customer, self.time, serving_time)
-            self.total_boarded += 1
+            self.customer_boarded(customer)
 
         # Update the next time that a customer is going to be served
         self.time_to_next_departure = self.bus.get_next_departure_time()
+
+    def customer_boarded(self, customer: int):
+        """This function updates the system statistics after a customer boards the bus"""
+
+        # The customer got the serving time of index total_boarded
+        if self.serving_classes is not None:
+            self.customers.assign_class(customer, self.serving_classes[self.total_boarded])
+
+        self.total_boarded += 1
+
+        if self.serving_log_likelihood_ratios is not None:
+            self.customers.weigh(customer, self.log_likelihood_ratio)
@@ -0,0 +1,143 @@
+import math
+
+"""File containing the online accumulators used to summarise our simulation in constant memory"""
+
+class RunningStatistic:
+    def __init__(self):
+        """This class keeps the running mean and variance of a stream of observations (Welford's algorithm)"""
+
+        # Number of observations so far
+        self.count = 0
+        # Running mean of the observations
+        self.mean = float('nan')
+        # Running sum of squared deviations from the mean
+        self.sum_squared_deviations = 0.0
+
+    def update(self, value: float):
+        """This function adds a new observation to the running statistic"""
+
+        self.count += 1
+
+        if self.count == 1:
+            self.mean = value
+            return
+
+        deviation = value - self.mean
+        self.mean += deviation / self.count
+        self.sum_squared_deviations += deviation * (value - self.mean)
+
+    @property
+    def variance(self):
+        """This function returns the sample variance of the observations"""
+        return self.sum_squared_deviations / (self.count - 1) if self.count > 1 else float('nan')
+
+    @property
+    def std(self):
+        """This function returns the sample standard deviation of the observations"""
+        return math.sqrt(self.variance)
+
+
+class TimeWeightedStatistic:
+    def __init__(self, start_time: float = 0, value: float = 0):
+        """This class keeps the time average of a piecewise constant quantity such as the queue length L(t)"""
+
+        self.start_time = start_time
+        # Time and value of the last change of the quantity
+        self.last_time = start_time
+        self.last_value = value
+        # Area under the quantity since the start time
+        self.area = 0.0
+
+    def update(self, time: float, value: float):
+        """This function records that the quantity changes to value at the given time"""
+
+        self.area += self.last_value * (time - self.last_time)
+        self.last_time = time
+        self.last_value = value
+
+    @property
+    def mean(self):
+        """This function returns the time average of the quantity up to the last change"""
+        elapsed = self.last_time - self.start_time
+        return self.area / elapsed if elapsed > 0 else float('nan')
+
+
+class BatchMeans:
+    def __init__(self, batch_size: int):
+        """This class keeps the means of consecutive batches of batch_size observations, so that a long run can be
+        analysed as a series of batch means in O(observations / batch_size) memory"""
+
+        self.batch_size = batch_size
+        # Means of the completed batches
+        self.means = []
+        # Sum and number of observations of the current batch
+        self.batch_sum = 0.0
+        self.batch_count = 0
+
+    def update(self, value: float):
+        """This function adds a new observation to the current batch"""
+
+        self.batch_sum += value
+        self.batch_count += 1
+
+        if self.batch_count == self.batch_size:
+            self.means.append(self.batch_sum / self.batch_size)
+            self.batch_sum = 0.0
+            self.batch_count = 0
+
+
+class StreamingStatistics:
+    def __init__(self, batch_size: int = None):
+        """This class accumulates the statistics reported by run_simulation in O(1) time and memory per event.
+        With a batch_size, the means of consecutive batches of waiting times and of queue lengths are kept as well, for
+        warm-up detection and batch means analysis"""
+
+        # Customer statistics, over the customers that have been served
+        self.waiting_time = RunningStatistic()
+        self.serving_time = RunningStatistic()
+        # Number of customers in the system seen by each arriving customer
+        self.customers_upon_arrival = RunningStatistic()
+        # Queue length after each event, and its time average
+        self.queue_length = RunningStatistic()
+        self.time_average_queue_length = TimeWeightedStatistic()
+
+        # Batch means of the waiting time (per served customer) and queue length (per event)
+        self.waiting_time_batches = BatchMeans(batch_size) if batch_size else None
+        self.queue_length_batches = BatchMeans(batch_size) if batch_size else None
+
+    def record_arrival(self, system_customers: int):
+        """This function records the number of customers in the system seen by a new arrival"""
+
+        self.customers_upon_arrival.update(system_customers)
+
+    def record_served(self, arrival_time: float, boarded_time: float, departure_time: float):
+        """This function records the statistics of a customer who has been served"""
+
+        self.waiting_time.update(boarded_time - arrival_time)
+        self.serving_time.update(departure_time - boarded_time)
+
+        if self.waiting_time_batches is not None:
+            self.waiting_time_batches.update(boarded_time - arrival_time)
+
+    def record_event(self, time: float, queue_length: int):
+        """This function records the queue length after an event"""
+
+        self.queue_length.update(queue_length)
+
+        if self.queue_length_batches is not None:
+            self.queue_length_batches.update(queue_length)
+
+        if time < float('inf'):
+            self.time_average_queue_length.update(time, queue_length)
+
+    def calculate_stats(self):
+        """This function returns the accumulated statistics, with the same keys as run_simulation"""
+
+        return {
+                'average_waiting_time': self.waiting_time.mean,
+                'average_queue_length': self.queue_length.mean,
+                'average_serving_time': self.serving_time.mean,
+                'average_customers_upon_arrival': self.customers_upon_arrival.mean,
+                'waiting_time_std': self.waiting_time.std,
+                'time_average_queue_length': self.time_average_queue_length.mean,
+                }
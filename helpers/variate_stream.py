@@ -0,0 +1,56 @@
+from typing import Callable
+import numpy as np
+
+"""File containing the VariateStream class for our simulation"""
+
+class VariateStream:
+    def __init__(self, sampler: Callable, block_size: int = 1024, rng: np.random.Generator = None):
+        """This class is an unbounded sequence of random variates that the simulation reads in order, in place of a
+        list of pre-generated times. Variates are drawn lazily in vectorized blocks of block_size with
+        sampler(block_size, rng), and only the current block is kept, so memory doesn't depend on the length of the
+        run. Indices must not go back before the start of the current block"""
+
+        self.sampler = sampler
+        self.block_size = block_size
+        self.rng = rng
+
+        # Current block of variates, as a list since plain floats are much faster than numpy scalars in the event loop
+        self.block = []
+        # Index of the first variate of the current block
+        self.block_start = 0
+
+        # Sum and number of every variate drawn so far
+        self.total = 0.0
+        self.count = 0
+
+    def _refill(self):
+        """This function draws the next block of variates"""
+
+        block = np.asarray(self.sampler(self.block_size, self.rng), dtype = float)
+
+        self.block_start += len(self.block)
+        self.block = block.tolist()
+        self.total += block.sum()
+        self.count += len(block)
+
+    def __getitem__(self, index: int) -> float:
+        """This function returns the variate at the given index, drawing new blocks when needed"""
+
+        if index < self.block_start:
+            raise IndexError(f"Variate {index} was discarded, the current block starts at {self.block_start}")
+
+        while index >= self.block_start + len(self.block):
+            self._refill()
+
+        return self.block[index - self.block_start]
+
+    def mean(self) -> float:
+        """This function returns the mean of every variate drawn so far"""
+
+        return self.total / self.count if self.count else float('nan')
+
+    def restore(self, stream: 'VariateStream'):
+        """This function takes over the state of another stream of the same variates, e.g. one read back from a
+        checkpoint, so that reading carries on from where that stream stopped"""
+
+        self.__dict__.update(stream.__dict__)
@@ -1,6 +1,10 @@
+import os
 import pandas as pd
-from utils.simulation import run_experiment
-from tqdm import tqdm
+from utils.result_cache import ResultCache
+from utils.results_store import ResultsStore
+from utils.checkpoint import Checkpointer
+from helpers.profile import SimulationProfile
+from utils.simulation import get_sweep_grid, run_sweep
 
 if __name__ == '__main__':
 
@@ -8,32 +12,58 @@ if __name__ == '__main__':
     time_limit = float("inf") # no time limit
     serving_limit = 1000
     iterations = 10
+    # Number of worker processes for the sweep (None uses every CPU) and the root seed of the sweep
+    workers = None
+    seed = 4702
+    # Every grid point is simulated: 'auto' would answer those where customers practically never wait with steady-state
+    # queueing theory (0 iterations, no stds), which the finite-horizon rows of the csvs below can't be told apart from
+    analytical = 'never'
+    # Grid points already run with the same parameters, seed and code are loaded from here instead
+    cache = ResultCache(os.path.join('data', 'cache'))
+    # Summaries are also written to a Parquet store as each grid point completes (needs pyarrow)
+    store = ResultsStore(os.path.join('data', 'results'))
+    # Grid points still running save their progress here every minute, so a pre-empted sweep resumes mid-experiment
+    checkpoint = Checkpointer(os.path.join('data', 'checkpoints'), interval=60)
+    # Instrument where the time of the sweep goes (profiled grid points bypass the cache)
+    profile = False
     variance_reduction_techniques = ['Standard MC', 'Antithetic Variables', 'Stratified Sampling', 'Control Variates']
     all_results = {technique: [] for technique in variance_reduction_techniques}
 
-    for arrival_lambda in [20, 50]:
-        for bus_seats in [50, 100]:
-            for bus_stops in tqdm([5, 10, 20]):
+    grid = get_sweep_grid(
+        arrival_lambdas=[20, 50],
+        bus_seats=[50, 100],
+        bus_stops=[5, 10, 20],
+        techniques=variance_reduction_techniques
+    )
 
-                for technique in variance_reduction_techniques:
+    results = run_sweep(
+        grid=grid,
+        iterations=iterations,
+        serving_limit=serving_limit,
+        time_limit=time_limit,
+        seed=seed,
+        workers=workers,
+        verbose=verbose,
+        analytical=analytical,
+        cache=cache,
+        store=store,
+        checkpoint=checkpoint,
+        profile=profile
+    )
 
-                    result = run_experiment(
-                        iterations=iterations,
-                        arrival_lambda=arrival_lambda,
-                        bus_seats=bus_seats,
-                        bus_stops=bus_stops,
-                        variance_reduction=technique,
-                        serving_limit=serving_limit,
-                        time_limit=time_limit,
-                        verbose=verbose
-                    )
+    # Profiles of every simulated grid point (analytical ones have none)
+    profiles = [result.pop('profile') for result in results if 'profile' in result]
 
-                    print(f"{technique}: {result}")
-                    all_results[technique].append(result)
+    for result in results:
+        print(f"{result['technique']}: {result}")
+        all_results[result['technique']].append(result)
 
     for technique in variance_reduction_techniques:
         all_results[technique] = pd.DataFrame(all_results[technique])
         print(f"{technique} results:\n{all_results[technique]}\n")
-        all_results[technique].to_csv(f"data\{technique} Results-3.csv")
+        all_results[technique].to_csv(os.path.join('data', f"{technique} Results-3.csv"))
+
+    if profile:
+        print(f"Sweep profile: {SimulationProfile.aggregate(profiles).to_dict()}")
 
 # TODO: Add logging statements
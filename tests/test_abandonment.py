@@ -0,0 +1,70 @@
+import numpy as np
+from helpers.bus_stop import BusStop
+from helpers.profile import SimulationProfile
+from helpers.simulation import Simulation
+from utils.simulation import run_simulation
+
+"""Tests of customers balking and reneging"""
+
+
+def test_profile_counts_reneges_apart():
+    # One seat, arrivals at 1, 2, 3, 4 and 5, the second and fourth arrivals reneging while the first ones ride
+    profile = SimulationProfile()
+    result = run_simulation(
+        1, 2, [1, 1, 1, 1, 1], [5, 5, 5, 5, 5], serving_limit = 10, patience_times = [9, 1, 9, 1, 9],
+        profile = profile)
+
+    assert result['reneged'] == 2
+    assert profile.renege_events == 2
+    assert profile.arrival_events == 5
+    assert profile.departure_events == 3
+    assert profile.events == 10
+
+
+def test_reused_id_reneging_twice_keeps_fifo_order():
+    bus_stop = BusStop()
+
+    # Customer 0 queues behind nobody, then 1, then 0 leaves and its id is reused by two later arrivals, the first of
+    # which leaves too, so the queue holds two stale entries of id 0 ahead of a live one
+    bus_stop.customer_arrives(0)
+    bus_stop.customer_arrives(1)
+    bus_stop.customer_balks(0)
+    bus_stop.customer_arrives(0)
+    bus_stop.customer_balks(0)
+    bus_stop.customer_arrives(2)
+    bus_stop.customer_arrives(0)
+
+    assert bus_stop.customers == 3
+    assert bus_stop.waiting_customers() == [1, 2, 0]
+
+    assert bus_stop.serve_customer() == 1
+    assert bus_stop.waiting_customers() == [2, 0]
+    assert bus_stop.serve_customer() == 2
+    assert bus_stop.serve_customer() == 0
+
+    assert bus_stop.customers == 0
+    assert not bus_stop.queue
+    assert not bus_stop.abandoned
+    assert bus_stop.serve_customer() is None
+
+
+def test_streamed_run_with_reused_ids_accounts_for_every_customer():
+    rng = np.random.default_rng(0)
+    customers = 5000
+    # An overloaded stop whose customers often renege, and whose ids are recycled when streaming
+    simulation = Simulation(
+        2, 2, rng.exponential(1 / 3, customers).tolist(), (rng.binomial(2, 0.5, customers) + 1.0).tolist(),
+        streaming = True, patience_times = rng.exponential(1, customers).tolist())
+
+    while min(simulation.time_to_next_arrival, simulation.time_to_next_departure, simulation.purge_reneges()) < np.inf:
+        simulation.time_step()
+        queued = simulation.busStop.waiting_customers()
+
+        assert len(queued) == simulation.busStop.customers
+        # Queueing customers are in the order of their arrival numbers
+        assert [simulation.waiting[customer] for customer in queued] == sorted(
+            simulation.waiting[customer] for customer in queued)
+
+    assert simulation.total_reneged > 0
+    assert simulation.customers.count < customers
+    assert simulation.total_served + simulation.total_reneged == simulation.total_arrivals
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from helpers.event_queue import EventQueue
+from helpers.network import Network
+from utils.distributions import Empirical
+from utils.network_simulation import run_network_simulation
+
+"""Tests of the bus route simulation"""
+
+
+def test_every_boarded_rider_gets_off_by_the_end_of_the_route():
+    # Ride lengths of 0 stops, e.g. from boarding data, still take riders to the next stop. The last bus leaves at
+    # 98, well before the end of the run, so every bus reaches the end of the route
+    result = run_network_simulation(
+        4, 5, 2.0, 200.0, buses = 50, ride_distribution = Empirical([0, 1, 2]), rng = np.random.default_rng(1))
+
+    assert result['boarded'] > 0
+    assert result['served'] == result['boarded']
+
+
+def test_unbounded_runs_are_rejected():
+    with pytest.raises(ValueError):
+        run_network_simulation(4, 3, 2.0, float('inf'), rng = np.random.default_rng(1))
+
+    # Arrivals from streams never run out, even with a limited number of buses
+    with pytest.raises(ValueError):
+        run_network_simulation(4, 3, 2.0, float('inf'), buses = 5, rng = np.random.default_rng(1))
+
+
+def test_fixed_arrivals_on_a_three_stop_route():
+    # Buses of 2 seats leave stop 0 at 0 and 10 and take 1 to reach the next stop. Passengers arrive at stop 0 at
+    # 0.5, 1 and 2 (riding 1, 2 and 2 stops) and at stop 1 at 0.2 and 5 (riding 1 stop each)
+    network = Network(
+        2, 3, [[0.5, 1.0, 2.0], [0.2, 5.0]], [[1, 2, 2], [1, 1]], headway = 10.0, travel_times = 1.0, buses = 2)
+    network.run(100.0)
+    history = network.customers.get_history()
+
+    # Customers are numbered in order of arrival: 0.2 at stop 1, then 0.5, 1 and 2 at stop 0, then 5 at stop 1
+    assert network.origins == [1, 0, 0, 0, 1]
+    assert network.destinations == [2, 1, 2, 2, 2]
+    # The first bus finds stop 0 empty and picks up the first passenger of stop 1, the second one boards the first
+    # two passengers of stop 0 (FIFO), leaving the third behind, and the second passenger of stop 1
+    assert history['boarded_time'].tolist() == [1.0, 10.0, 10.0, np.inf, 11.0]
+    # Riders get off at their destination
+    assert history['departure_time'].tolist() == [2.0, 11.0, 12.0, np.inf, 12.0]
+
+    result = network.calculate_statistics(100.0)
+
+    assert result['arrivals'] == 5
+    assert result['boarded'] == 4
+    assert result['served'] == 4
+    assert result['left_behind'] == 1
+    assert result['buses_dispatched'] == 2
+    assert result['average_waiting_time'] == np.mean([0.8, 9.5, 9.0, 6.0])
+
+
+def test_event_queue_orders_by_time_priority_then_scheduling():
+    events = EventQueue()
+    events.schedule(2.0, 'late')
+    events.schedule(1.0, 'passenger', 'first', priority = 2)
+    events.schedule(1.0, 'bus', priority = 0)
+    events.schedule(1.0, 'passenger', 'second', priority = 2)
+
+    assert len(events) == 4
+    assert events.peek_time() == 1.0
+    assert [events.pop() for _ in range(4)] == [
+        (1.0, 'bus', None), (1.0, 'passenger', 'first'), (1.0, 'passenger', 'second'), (2.0, 'late', None)]
+    assert events.peek_time() == float('inf')
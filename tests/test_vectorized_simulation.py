@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from utils.simulation import run_simulation
+from utils.vectorized_simulation import run_simulation_vectorized, run_simulation_batch
+
+"""Tests that the vectorized and batch engines give the same results as the object engine"""
+
+OUTPUTS = ('average_waiting_time', 'average_queue_length', 'average_serving_time', 'average_customers_upon_arrival')
+REPLICATIONS = 4
+CUSTOMERS = 300
+
+
+def generate_inputs(seed: int, arrival_lambda: float, bus_stops: int):
+    """This function draws (REPLICATIONS, CUSTOMERS) arrays of exponential interarrival and binomial serving times"""
+
+    rng = np.random.default_rng(seed)
+    interarrival_times = rng.exponential(1 / arrival_lambda, (REPLICATIONS, CUSTOMERS))
+    serving_times = rng.binomial(bus_stops, 0.5, (REPLICATIONS, CUSTOMERS)) + 1.0
+
+    return interarrival_times, serving_times
+
+
+def assert_same_results(object_results, vectorized_results):
+    for output in OUTPUTS:
+        assert np.isclose(object_results[output], vectorized_results[output], rtol = 1e-9, equal_nan = True), output
+
+
+@pytest.mark.parametrize('bus_seats', [1, 3, 10, 50])
+@pytest.mark.parametrize('arrival_lambda', [1, 5, 20])
+@pytest.mark.parametrize(
+    'serving_limit, time_limit', [(CUSTOMERS, float('inf')), (120, float('inf')), (CUSTOMERS, 25.0)])
+@pytest.mark.parametrize('arrival_process', [False, True])
+def test_engines_agree(bus_seats, arrival_lambda, serving_limit, time_limit, arrival_process):
+    interarrival_times, serving_times = generate_inputs(bus_seats * 100 + arrival_lambda, arrival_lambda, 5)
+    # Absolute arrival times, as fed for arrival processes
+    arrival_times = np.cumsum(interarrival_times, axis = 1) if arrival_process else None
+
+    batch_results = run_simulation_batch(
+        bus_seats, 5, interarrival_times, serving_times, serving_limit, time_limit, chunk_size = 3,
+        arrival_times = arrival_times)
+
+    for replication in range(REPLICATIONS):
+        replication_arrival_times = None if arrival_times is None else arrival_times[replication].tolist()
+
+        object_results = run_simulation(
+            bus_seats, 5, interarrival_times[replication].tolist(), serving_times[replication].tolist(),
+            serving_limit, time_limit, arrival_times = replication_arrival_times)
+        vectorized_results = run_simulation_vectorized(
+            bus_seats, 5, interarrival_times[replication], serving_times[replication], serving_limit, time_limit,
+            arrival_times = replication_arrival_times)
+
+        assert_same_results(object_results, vectorized_results)
+        assert_same_results(object_results, {output: batch_results[output][replication] for output in OUTPUTS})
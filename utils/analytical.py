@@ -0,0 +1,169 @@
+from typing import Dict
+import numpy as np
+
+"""File containing the queueing theory approximations of our system (M/M/c and M/G/c with binomial serving times)"""
+
+
+def get_serving_time_moments(bus_stops: int, p: float = 0.5):
+    """
+    This function returns the moments of the serving time Binomial(bus_stops, p) + 1
+    Parameters
+    ----------
+    bus_stops : number of bus stops (trials of the binomial)
+    p : the probability of a trial being successful
+
+    Returns
+    -------
+    The mean and the variance of the serving time
+    """
+
+    return bus_stops * p + 1, bus_stops * p * (1 - p)
+
+
+def erlang_c(servers: int, offered_load: float) -> float:
+    """
+    This function returns the Erlang C probability that an arriving customer has to wait in an M/M/c queue
+    Parameters
+    ----------
+    servers : number of servers c
+    offered_load : arrival rate times mean serving time, in Erlangs
+
+    Returns
+    -------
+    The probability of waiting (1 when the queue is unstable)
+    """
+
+    if offered_load >= servers:
+        return 1.0
+
+    # Erlang B by its numerically stable recursion, then converted to Erlang C
+    erlang_b = 1.0
+
+    for server in range(1, servers + 1):
+        erlang_b = offered_load * erlang_b / (server + offered_load * erlang_b)
+
+    return servers * erlang_b / (servers - offered_load * (1 - erlang_b))
+
+
+def mmc_waiting_time(arrival_lambda: float, mean_serving_time: float, servers: int) -> float:
+    """
+    This function returns the mean waiting time in the queue of an M/M/c queue
+    Parameters
+    ----------
+    arrival_lambda : the arrival rate
+    mean_serving_time : the mean serving time
+    servers : number of servers c
+
+    Returns
+    -------
+    The mean waiting time before being served (infinite when the queue is unstable)
+    """
+
+    offered_load = arrival_lambda * mean_serving_time
+
+    if offered_load >= servers:
+        return float('inf')
+
+    return erlang_c(servers, offered_load) * mean_serving_time / (servers - offered_load)
+
+
+def mgc_waiting_time(
+    arrival_lambda: float, mean_serving_time: float, serving_time_variance: float, servers: int,
+    arrival_scv: float = 1.0) -> float:
+
+    """
+    This function returns the Allen-Cunneen approximation of the mean waiting time in a G/G/c queue, which scales the
+    M/M/c waiting time by (Ca^2 + Cs^2) / 2. With Poisson arrivals (Ca^2 = 1) it is the Lee-Longton M/G/c approximation
+    Parameters
+    ----------
+    arrival_lambda : the arrival rate
+    mean_serving_time : the mean serving time
+    serving_time_variance : the variance of the serving time
+    servers : number of servers c
+    arrival_scv : squared coefficient of variation of the interarrival times (1 for Poisson arrivals)
+
+    Returns
+    -------
+    The approximate mean waiting time before being served (infinite when the queue is unstable)
+    """
+
+    serving_scv = serving_time_variance / mean_serving_time ** 2
+
+    return mmc_waiting_time(arrival_lambda, mean_serving_time, servers) * (arrival_scv + serving_scv) / 2
+
+
+def get_analytical_result(
+    arrival_lambda: float, bus_seats: int, bus_stops: int, variance_reduction: str = 'Standard MC',
+    approximation: str = 'mgc') -> Dict:
+
+    """This function returns the steady-state approximation of our system with the keys of the run_experiment summary.
+    approximation is 'mgc' (Allen-Cunneen with the binomial serving time moments) or 'mmc' (exponential serving times
+    with the same mean). Standard deviations across replications don't exist here and are nan; the customers upon
+    arrival are the mean number in the system, L = lambda * (Wq + E[S]), which arrivals see by PASTA"""
+
+    if approximation not in ('mgc', 'mmc'):
+        raise ValueError(f"Unknown approximation {approximation!r}, expected 'mgc' or 'mmc'")
+
+    mean_serving_time, serving_time_variance = get_serving_time_moments(bus_stops)
+    offered_load = arrival_lambda * mean_serving_time
+
+    if approximation == 'mmc':
+        waiting_time = mmc_waiting_time(arrival_lambda, mean_serving_time, bus_seats)
+    else:
+        waiting_time = mgc_waiting_time(arrival_lambda, mean_serving_time, serving_time_variance, bus_seats)
+
+    return {
+        'technique': variance_reduction,
+        'iterations': 0,
+        'arrival_lambda': arrival_lambda,
+        'bus_seats': bus_seats,
+        'bus_stops': bus_stops,
+        'waiting_time_mean': waiting_time,
+        'waiting_time_std': float('nan'),
+        'serving_time_mean': mean_serving_time,
+        'serving_time_std': float('nan'),
+        'customers_upon_arrival_mean': arrival_lambda * (waiting_time + mean_serving_time),
+        'customers_upon_arrival_std': float('nan'),
+        'method': f'analytical ({approximation})',
+        'utilisation': offered_load / bus_seats,
+        'probability_of_waiting': erlang_c(bus_seats, offered_load),
+    }
+
+
+def is_lightly_loaded(arrival_lambda: float, bus_seats: int, bus_stops: int, threshold: float = 1e-3) -> bool:
+    """This function tells whether an arriving customer waits with probability below the threshold (Erlang C), in
+    which case customers practically never queue and the analytical result can stand in for a simulation"""
+
+    mean_serving_time, _ = get_serving_time_moments(bus_stops)
+
+    return erlang_c(bus_seats, arrival_lambda * mean_serving_time) < threshold
+
+
+def validate_simulation(summary: Dict, approximation: str = 'mgc') -> Dict:
+    """
+    This function compares the summary of run_experiment with the analytical approximation of the same configuration
+    Parameters
+    ----------
+    summary : the result of run_experiment
+    approximation : 'mgc' or 'mmc', see get_analytical_result
+
+    Returns
+    -------
+    The analytical values and the relative differences of the simulated waiting time, serving time and customers upon
+    arrival. Simulations start from an empty system and serve a finite number of customers, so some bias with respect
+    to the steady state is expected, especially near or above full load
+    """
+
+    analytical = get_analytical_result(
+        summary['arrival_lambda'], summary['bus_seats'], summary['bus_stops'], summary['technique'], approximation)
+    validation = {'utilisation': analytical['utilisation']}
+
+    for key in ('waiting_time_mean', 'serving_time_mean', 'customers_upon_arrival_mean'):
+        validation[f'analytical_{key}'] = analytical[key]
+
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            validation[f'{key}_relative_difference'] = (
+                (summary[key] - analytical[key]) / analytical[key] if analytical[key] != 0
+                else float('nan') if summary[key] != 0 else 0.0)
+
+    return validation
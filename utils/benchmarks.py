@@ -0,0 +1,269 @@
+import json
+import platform
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+import numpy as np
+import pandas as pd
+from helpers.simulation import Simulation
+from utils import inverse_transform_sampling as sampling
+from utils.simulation import (
+    aggregate_results, get_average_waiting_time, get_average_serving_time, get_average_queue_length,
+    generate_inputs, get_sweep_grid, run_sweep)
+from utils.vectorized_simulation import run_simulation_vectorized, run_simulation_batch
+
+"""File containing the benchmark suite for the simulation engines, the samplers and the sweep"""
+
+
+def time_callable(function: Callable, repeats: int = 3) -> float:
+    """
+    This function times a callable
+    Parameters
+    ----------
+    function : the callable to time, called without arguments
+    repeats : number of times the callable is timed
+
+    Returns
+    -------
+    The best wall-clock time in seconds over the repeats
+    """
+
+    timings = []
+
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+def _record(name: str, parameters: Dict, seconds: float, operations: int = None, unit: str = None) -> Dict:
+    """This function builds one benchmark record, with the throughput when the number of operations is known"""
+
+    record = {'name': name, 'parameters': parameters, 'seconds': seconds}
+
+    if operations is not None:
+        record['rate'] = operations / seconds if seconds > 0 else float('inf')
+        record['unit'] = unit
+
+    return record
+
+
+def benchmark_time_step(
+    bus_seats_list: List[int] = (10, 50, 200, 1000), customers: int = 2000, arrival_lambda: float = 20,
+    bus_stops: int = 10, repeats: int = 3, seed: int = 0) -> List[Dict]:
+
+    """This function measures the event throughput of Simulation.time_step for each event calendar, and the customer
+    throughput of the array engines, as the number of seats grows"""
+
+    interarrival_times, serving_times = generate_inputs(
+        'Standard MC', arrival_lambda, bus_stops, customers, np.random.default_rng(seed))
+    records = []
+
+    for bus_seats in bus_seats_list:
+
+        for event_calendar in ('list', 'heap'):
+
+            def step_through() -> int:
+                simulation = Simulation(
+                    bus_seats, bus_stops, interarrival_times.tolist(), serving_times.tolist(),
+                    event_calendar = event_calendar)
+                events = 0
+
+                while simulation.total_served < customers:
+                    simulation.time_step()
+                    events += 1
+
+                return events
+
+            records.append(_record(
+                'time_step', {'bus_seats': bus_seats, 'event_calendar': event_calendar, 'customers': customers},
+                time_callable(step_through, repeats), step_through(), 'events/s'))
+
+        records.append(_record(
+            'run_simulation_vectorized', {'bus_seats': bus_seats, 'customers': customers},
+            time_callable(lambda: run_simulation_vectorized(
+                bus_seats, bus_stops, interarrival_times, serving_times, customers), repeats),
+            customers, 'customers/s'))
+
+        replications = 100
+        records.append(_record(
+            'run_simulation_batch', {'bus_seats': bus_seats, 'customers': customers, 'replications': replications},
+            time_callable(lambda: run_simulation_batch(
+                bus_seats, bus_stops, np.tile(interarrival_times, (replications, 1)),
+                np.tile(serving_times, (replications, 1)), customers), repeats),
+            customers * replications, 'customers/s'))
+
+    return records
+
+
+def benchmark_samplers(sample_sizes: List[int] = (1000, 10000, 100000), repeats: int = 3, seed: int = 0) -> List[Dict]:
+    """This function measures the throughput of every sampler in utils/inverse_transform_sampling as the sample size
+    grows"""
+
+    rng = np.random.default_rng(seed)
+    samplers = {
+        'generate_exponential': lambda size: sampling.generate_exponential(20, size, rng),
+        'generate_exponential_antithetic': lambda size: sampling.generate_exponential_antithetic(20, size, rng),
+        'generate_exponential_control_variate':
+            lambda size: sampling.generate_exponential_control_variate(20, size, rng),
+        'generate_exponential_stratified': lambda size: sampling.generate_exponential_stratified(20, size, 10, rng),
+        'generate_normal': lambda size: sampling.generate_normal(num_samples = size, rng = rng),
+        'generate_binomial': lambda size: sampling.generate_binomial(10, num_samples = size, rng = rng),
+        'generate_binomial_antithetic': lambda size: sampling.generate_binomial_antithetic(10, size, rng = rng),
+        'generate_binomial_stratified': lambda size: sampling.generate_binomial_stratified(10, size, 10, rng = rng),
+    }
+    records = []
+
+    for name, sampler in samplers.items():
+
+        for sample_size in sample_sizes:
+            records.append(_record(
+                name, {'sample_size': sample_size}, time_callable(lambda: sampler(sample_size), repeats),
+                sample_size, 'samples/s'))
+
+    return records
+
+
+def benchmark_aggregation(
+    customers_list: List[int] = (1000, 10000), bus_seats: int = 50, arrival_lambda: float = 20, bus_stops: int = 10,
+    repeats: int = 3, seed: int = 0) -> List[Dict]:
+
+    """This function measures the cost of building the customer and step result tables (get_customer_history and
+    aggregate_results) and of the get_average_* functions on them, for a run with the given number of customers"""
+
+    records = []
+
+    for customers in customers_list:
+
+        interarrival_times, serving_times = generate_inputs(
+            'Standard MC', arrival_lambda, bus_stops, customers, np.random.default_rng(seed))
+        simulation = Simulation(bus_seats, bus_stops, interarrival_times.tolist(), serving_times.tolist())
+        step_results = []
+
+        while simulation.total_served < customers:
+            simulation.time_step()
+            step_results.append(simulation.calculate_statistics())
+
+        customer_history = simulation.get_customer_history()
+        customer_results, system_results = pd.DataFrame(customer_history), aggregate_results(step_results)
+        parameters = {'customers': customers}
+
+        records.append(_record(
+            'get_customer_history', parameters,
+            time_callable(lambda: pd.DataFrame(simulation.get_customer_history()), repeats), customers, 'rows/s'))
+        records.append(_record(
+            'aggregate_results', {**parameters, 'history': 'system'},
+            time_callable(lambda: aggregate_results(step_results), repeats), len(step_results), 'rows/s'))
+        records.append(_record(
+            'get_average_waiting_time', parameters,
+            time_callable(lambda: get_average_waiting_time(customer_results), repeats)))
+        records.append(_record(
+            'get_average_serving_time', parameters,
+            time_callable(lambda: get_average_serving_time(customer_results), repeats)))
+        records.append(_record(
+            'get_average_queue_length', parameters,
+            time_callable(lambda: get_average_queue_length(system_results), repeats)))
+
+    return records
+
+
+def benchmark_sweep(
+    iterations: int = 2, serving_limit: int = 1000, engines: List[str] = ('object', 'batch'), workers: int = 1,
+    repeats: int = 1, seed: int = 0) -> List[Dict]:
+
+    """This function measures the main.py sweep end to end for each engine"""
+
+    grid = get_sweep_grid(
+        [20, 50], [50, 100], [5, 10, 20],
+        ['Standard MC', 'Antithetic Variables', 'Stratified Sampling', 'Control Variates'])
+    records = []
+
+    for engine in engines:
+        records.append(_record(
+            'sweep', {'engine': engine, 'iterations': iterations, 'serving_limit': serving_limit, 'workers': workers},
+            time_callable(lambda: run_sweep(
+                grid, iterations, serving_limit, seed = seed, workers = workers, engine = engine), repeats),
+            len(grid), 'grid points/s'))
+
+    return records
+
+
+def run_benchmarks(quick: bool = False) -> Dict:
+    """This function runs the whole benchmark suite (a reduced version when quick) and returns the results along with
+    the environment they were measured in"""
+
+    if quick:
+        records = (
+            benchmark_time_step(bus_seats_list = (10, 200), customers = 500, repeats = 1)
+            + benchmark_samplers(sample_sizes = (1000, 10000), repeats = 1)
+            + benchmark_aggregation(customers_list = (1000,), repeats = 1)
+            + benchmark_sweep(iterations = 1, serving_limit = 200, engines = ('batch',)))
+    else:
+        records = benchmark_time_step() + benchmark_samplers() + benchmark_aggregation() + benchmark_sweep()
+
+    return {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+        },
+        'quick': quick,
+        'results': records,
+    }
+
+
+def save_benchmarks(benchmarks: Dict, path: str):
+    """This function saves benchmark results as JSON"""
+
+    with open(path, 'w') as file:
+        json.dump(benchmarks, file, indent = 2, default = float)
+
+
+def load_benchmarks(path: str) -> Dict:
+    """This function loads benchmark results saved with save_benchmarks"""
+
+    with open(path) as file:
+        return json.load(file)
+
+
+def compare_benchmarks(current: Dict, baseline: Dict, tolerance: float = 0.2) -> List[Dict]:
+    """
+    This function compares benchmark results against a baseline
+    Parameters
+    ----------
+    current : the results of run_benchmarks
+    baseline : earlier results of run_benchmarks, e.g. loaded with load_benchmarks
+    tolerance : relative slowdown above which a benchmark is flagged as a regression
+
+    Returns
+    -------
+    One comparison per benchmark present in both results, with the ratio of the current to the baseline time and
+    whether it is a regression
+    """
+
+    def key(record):
+        return record['name'], json.dumps(record['parameters'], sort_keys = True)
+
+    baseline_records = {key(record): record for record in baseline['results']}
+    comparisons = []
+
+    for record in current['results']:
+
+        if key(record) not in baseline_records:
+            continue
+
+        ratio = record['seconds'] / baseline_records[key(record)]['seconds']
+        comparisons.append({
+            'name': record['name'],
+            'parameters': record['parameters'],
+            'baseline_seconds': baseline_records[key(record)]['seconds'],
+            'seconds': record['seconds'],
+            'ratio': ratio,
+            'regression': ratio > 1 + tolerance,
+        })
+
+    return comparisons
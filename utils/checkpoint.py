@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import time
+import zlib
+from typing import Any, Dict, Optional
+from utils.inverse_transform_sampling import get_generator
+from utils.result_cache import get_code_version, json_default
+
+"""File containing the on-disk checkpoints of long simulations and experiments, so that they survive interruptions"""
+
+# Version of the layout of checkpoint files, checkpoints of another layout are ignored
+CHECKPOINT_FORMAT = 1
+# Number of events the event loop runs between two looks at the clock
+EVENTS_PER_CHECK = 1000
+
+
+class Checkpointer:
+    def __init__(
+        self, directory: str = os.path.join('data', 'checkpoints'), interval: float = 60.0, code_version: str = None,
+        compression_level: int = 6):
+
+        """This class keeps the state of unfinished runs as one compressed pickle per set of parameters, written at
+        most every interval seconds (wall-clock) per run. Files are written atomically, so an interruption leaves the
+        previous checkpoint intact, and checkpoints of other code versions are never resumed. The state of the
+        module's default random number generator is saved alongside, so unseeded runs resume exactly too"""
+
+        self.directory = directory
+        self.interval = interval
+        self.code_version = get_code_version() if code_version is None else code_version
+        self.compression_level = compression_level
+        # Wall-clock time of the last checkpoint (or of the start) of every run, by key
+        self.last_saves = {}
+
+    def key(self, parameters: Dict) -> str:
+        """This function hashes the parameters of a run together with the code version"""
+
+        parameters = json.dumps(
+            {**parameters, 'code_version': self.code_version}, sort_keys = True, default = json_default)
+
+        return hashlib.sha256(parameters.encode()).hexdigest()
+
+    def path(self, parameters: Dict) -> str:
+        """This function returns the file the checkpoint of the run is kept in"""
+
+        return os.path.join(self.directory, f"{self.key(parameters)}.ckpt")
+
+    def load(self, parameters: Dict) -> Optional[Any]:
+        """This function returns the state of the last checkpoint of the run and restores the default random number
+        generator to its state at that time, or returns None when the run has no checkpoint. Either way, the interval
+        until the next checkpoint starts now"""
+
+        self.last_saves[self.key(parameters)] = time.monotonic()
+
+        try:
+            with open(self.path(parameters), 'rb') as file:
+                checkpoint = pickle.loads(zlib.decompress(file.read()))
+        except (FileNotFoundError, zlib.error, pickle.UnpicklingError, EOFError):
+            return None
+
+        if checkpoint.get('format') != CHECKPOINT_FORMAT:
+            return None
+
+        get_generator().bit_generator.state = checkpoint['default_generator']
+
+        return checkpoint['state']
+
+    def due(self, parameters: Dict) -> bool:
+        """This function returns whether the run is due a checkpoint"""
+
+        return time.monotonic() - self.last_saves.get(self.key(parameters), float('-inf')) >= self.interval
+
+    def save(self, parameters: Dict, state: Any, force: bool = False) -> bool:
+        """This function writes the state of the run to its checkpoint if it is due one (or with force), and returns
+        whether it was written"""
+
+        if not force and not self.due(parameters):
+            return False
+
+        checkpoint = {
+            'format': CHECKPOINT_FORMAT, 'parameters': parameters,
+            'default_generator': get_generator().bit_generator.state, 'state': state}
+        data = zlib.compress(pickle.dumps(checkpoint, protocol = pickle.HIGHEST_PROTOCOL), self.compression_level)
+
+        os.makedirs(self.directory, exist_ok = True)
+        descriptor, temporary_path = tempfile.mkstemp(dir = self.directory, suffix = '.tmp')
+
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                file.write(data)
+
+            os.replace(temporary_path, self.path(parameters))
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+        self.last_saves[self.key(parameters)] = time.monotonic()
+
+        return True
+
+    def remove(self, parameters: Dict):
+        """This function removes the checkpoint of a finished run"""
+
+        self.last_saves.pop(self.key(parameters), None)
+
+        try:
+            os.remove(self.path(parameters))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,130 @@
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+import scipy.stats as stats
+from utils.simulation import generate_input_uniforms, transform_input_uniforms, summarise_experiment
+from utils.vectorized_simulation import run_simulation_batch
+
+"""File containing the common random numbers sweep, where every grid point is simulated from the same uniforms"""
+
+# Fixed order of the techniques, so that the uniforms of a technique don't depend on which others are in the sweep
+TECHNIQUES = ('Standard MC', 'Antithetic Variables', 'Stratified Sampling', 'Control Variates', 'Latin Hypercube')
+
+
+def get_technique_generator(chunk_seed: np.random.SeedSequence, variance_reduction: str) -> np.random.Generator:
+    """This function returns the random number generator of a technique for one chunk of replications"""
+
+    technique_seed = np.random.SeedSequence(
+        entropy = chunk_seed.entropy, spawn_key = chunk_seed.spawn_key + (TECHNIQUES.index(variance_reduction),))
+
+    return np.random.default_rng(technique_seed)
+
+
+def run_sweep_common_random_numbers(
+    grid: List[Dict], iterations: int, serving_limit: int = 100, time_limit: float = float('inf'), seed = None,
+    chunk_size: int = 1000) -> pd.DataFrame:
+
+    """This function runs every grid point of a sweep (see get_sweep_grid) on common random numbers: replication r
+    uses the same underlying uniforms at every grid point with the same technique, mapped through that grid point's
+    inverse transforms. The uniforms are generated once per chunk of chunk_size replications and shared by the whole
+    grid, so they are paid for once per sweep and memory stays bounded by the chunk. Results are reproducible for a
+    given seed and chunk_size.
+
+    Returns the per-replication results, with a 'replication' column, so that configurations can be compared
+    replication by replication with get_paired_difference (see also summarise_sweep)"""
+
+    techniques = {grid_point['variance_reduction'] for grid_point in grid}
+    unknown_techniques = techniques - set(TECHNIQUES)
+
+    if unknown_techniques:
+        raise ValueError(f"Unknown techniques {sorted(unknown_techniques)}, expected some of {list(TECHNIQUES)}")
+
+    root_seed = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    chunk_starts = range(0, iterations, chunk_size)
+    sweep_results = []
+
+    for start, chunk_seed in zip(chunk_starts, root_seed.spawn(len(chunk_starts))):
+
+        replications = min(chunk_size, iterations - start)
+        uniforms = {
+            technique: generate_input_uniforms(
+                technique, (replications, serving_limit), get_technique_generator(chunk_seed, technique))
+            for technique in techniques}
+
+        for grid_point in grid:
+
+            interarrival_times, serving_times = transform_input_uniforms(
+                grid_point['variance_reduction'], *uniforms[grid_point['variance_reduction']],
+                grid_point['arrival_lambda'], grid_point['bus_stops'])
+            batch_results = run_simulation_batch(
+                grid_point['bus_seats'], grid_point['bus_stops'], interarrival_times, serving_times, serving_limit,
+                time_limit, replications)
+
+            for replication in range(replications):
+                sweep_results.append({
+                    'replication': start + replication,
+                    **grid_point,
+                    **{key: value[replication] for key, value in batch_results.items()},
+                })
+
+    return pd.DataFrame(sweep_results)
+
+
+def _select(sweep_results: pd.DataFrame, grid_point: Dict) -> pd.DataFrame:
+    """This function returns the per-replication results of one grid point, indexed by replication"""
+
+    mask = np.logical_and.reduce([sweep_results[key] == value for key, value in grid_point.items()])
+
+    return sweep_results[mask].set_index('replication').sort_index()
+
+
+def summarise_sweep(sweep_results: pd.DataFrame) -> List[Dict]:
+    """This function summarises the per-replication results of a sweep like run_experiment, one dict per grid point"""
+
+    grid_columns = ['arrival_lambda', 'bus_seats', 'bus_stops', 'variance_reduction']
+    summaries = []
+
+    for grid_values, results in sweep_results.groupby(grid_columns, sort = False):
+        grid_point = dict(zip(grid_columns, grid_values))
+        summaries.append(summarise_experiment(
+            results.to_dict('records'), len(results), grid_point['arrival_lambda'], grid_point['bus_seats'],
+            grid_point['bus_stops'], grid_point['variance_reduction']))
+
+    return summaries
+
+
+def get_paired_difference(
+    sweep_results: pd.DataFrame, baseline: Dict, alternative: Dict, metric: str = 'average_waiting_time',
+    confidence: float = 0.95) -> Dict:
+
+    """
+    This function estimates the difference in a metric between two grid points from their paired replications
+    Parameters
+    ----------
+    sweep_results : the per-replication results of run_sweep_common_random_numbers
+    baseline : the parameters selecting the first grid point (e.g. {'bus_seats': 50, 'bus_stops': 10, ...})
+    alternative : the parameters selecting the second grid point
+    metric : the per-replication column to compare
+    confidence : the confidence level of the interval
+
+    Returns
+    -------
+    The mean and standard deviation of the paired differences (alternative - baseline), the half-width of their
+    confidence interval and the variance reduction with respect to comparing independent runs
+    """
+
+    baseline_results = _select(sweep_results, baseline)[metric]
+    alternative_results = _select(sweep_results, alternative)[metric]
+    differences = (alternative_results - baseline_results).dropna()
+    replications = len(differences)
+    independent_variance = baseline_results.var() + alternative_results.var()
+
+    return {
+        'metric': metric,
+        'replications': replications,
+        'difference_mean': differences.mean(),
+        'difference_std': differences.std(),
+        'difference_half_width':
+            stats.t.ppf((1 + confidence) / 2, replications - 1) * differences.std() / np.sqrt(replications),
+        'variance_reduction_ratio': independent_variance / differences.var() if differences.var() > 0 else float('inf'),
+    }
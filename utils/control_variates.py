@@ -0,0 +1,66 @@
+from typing import Dict
+import numpy as np
+from utils.analytical import get_serving_time_moments
+from utils.distributions import Distribution, get_input_distributions
+
+"""File containing the output-level control variates estimator, which regresses the replication outputs on the
+sample means of their inputs, whose expectations are known"""
+
+# Per-replication input sample means used as controls, as recorded by run_replications
+CONTROLS = ('average_interarrival_time', 'average_input_serving_time')
+
+
+def get_control_means(
+    arrival_lambda: float, bus_stops: int, interarrival_distribution: Distribution = None,
+    serving_distribution: Distribution = None) -> np.ndarray:
+
+    """This function returns the known expectations of the controls: 1 / lambda for the interarrival times and
+    n * p + 1 for the binomial serving times, or the means of the given input distributions"""
+
+    if interarrival_distribution is None and serving_distribution is None:
+        return np.array([1 / arrival_lambda, get_serving_time_moments(bus_stops)[0]])
+
+    interarrival_distribution, serving_distribution = get_input_distributions(
+        arrival_lambda, bus_stops, interarrival_distribution, serving_distribution)
+    control_means = np.array([interarrival_distribution.mean(), serving_distribution.mean()])
+
+    if np.isnan(control_means).any():
+        raise ValueError("Output control variates need input distributions with known means")
+
+    return control_means
+
+
+def apply_control_variates(outputs, controls, control_means) -> Dict:
+    """
+    This function adjusts replication outputs with control variates, Y - (C - E[C]) beta, where the coefficients
+    beta = Cov(C)^-1 Cov(C, Y) minimise the variance of the adjusted outputs. They are estimated by least squares on
+    the centred outputs and controls of all replications at once (the minimum norm solution when a control is
+    constant, e.g. serving times with 0 bus stops)
+    Parameters
+    ----------
+    outputs : (replications, outputs) array of the replication outputs
+    controls : (replications, controls) array of the controls of each replication
+    control_means : the known expectations of the controls
+
+    Returns
+    -------
+    The adjusted outputs, the coefficients (controls, outputs) and, for each output, the variance reduction ratio
+    Var(Y) / Var(adjusted Y) with respect to the unadjusted outputs
+    """
+
+    outputs = np.asarray(outputs, dtype = float)
+    controls = np.asarray(controls, dtype = float)
+    centred_controls = controls - controls.mean(axis = 0)
+
+    if len(outputs) <= controls.shape[1] + 1:
+        # Too few replications to estimate the coefficients
+        beta = np.zeros((controls.shape[1], outputs.shape[1]))
+    else:
+        beta = np.linalg.lstsq(centred_controls, outputs - outputs.mean(axis = 0), rcond = None)[0]
+
+    adjusted_outputs = outputs - (controls - control_means) @ beta
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        variance_reduction_ratio = outputs.var(axis = 0, ddof = 1) / adjusted_outputs.var(axis = 0, ddof = 1)
+
+    return {'outputs': adjusted_outputs, 'beta': beta, 'variance_reduction_ratio': variance_reduction_ratio}
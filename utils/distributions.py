@@ -0,0 +1,387 @@
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Tuple
+import numpy as np
+import pandas as pd
+import scipy.stats as stats
+from utils.inverse_transform_sampling import (
+    Shape, get_generator, generate_uniform, exponential_inverse, binomial_inverse)
+
+"""File containing the registry of interarrival and serving time distributions. Every distribution samples whole
+arrays at once, so the event loop only reads pre-generated times and never dispatches on the distribution per sample"""
+
+class Distribution(ABC):
+    """This class is the interface of the distributions of the registry. Distributions that are invertible map
+    uniform random numbers to samples with inverse, so every variance reduction technique applies to them; the others
+    (e.g. thinned arrival processes) are only sampled from a random number generator. Stationary distributions draw
+    independent samples, while arrival processes (see ArrivalProcess) draw successive interarrival times"""
+
+    invertible = True
+    stationary = True
+
+    @abstractmethod
+    def inverse(self, random_numbers) -> np.ndarray:
+        """This function is the inverse transform of the distribution, applied elementwise"""
+
+    def sample(self, num_samples: Shape = None, rng: np.random.Generator = None) -> np.ndarray:
+        """This function draws num_samples (an integer or a (replications, samples) shape) from the distribution"""
+
+        return self.inverse(generate_uniform(num_samples, rng))
+
+    def mean(self) -> float:
+        """This function returns the mean of the distribution (nan when unknown)"""
+
+        return float('nan')
+
+    def variance(self) -> float:
+        """This function returns the variance of the distribution (nan when unknown)"""
+
+        return float('nan')
+
+    def parameters(self) -> Dict:
+        """This function returns the name and parameters of the distribution, which identify it in cache keys (None
+        when it can't be described, e.g. a callable rate)"""
+
+        return None
+
+
+class Exponential(Distribution):
+    def __init__(self, rate: float):
+        """This class is the exponential distribution with the given rate (1 / mean)"""
+
+        self.rate = rate
+
+    def inverse(self, random_numbers) -> np.ndarray:
+        return exponential_inverse(random_numbers, self.rate)
+
+    def mean(self) -> float:
+        return 1 / self.rate
+
+    def variance(self) -> float:
+        return 1 / self.rate ** 2
+
+    def parameters(self) -> Dict:
+        return {'name': 'exponential', 'rate': self.rate}
+
+
+class Erlang(Distribution):
+    def __init__(self, shape: int, rate: float):
+        """This class is the Erlang distribution, the sum of shape exponentials with the given rate"""
+
+        self.shape = shape
+        self.rate = rate
+
+    def inverse(self, random_numbers) -> np.ndarray:
+        return stats.gamma.ppf(random_numbers, a = self.shape, scale = 1 / self.rate)
+
+    def mean(self) -> float:
+        return self.shape / self.rate
+
+    def variance(self) -> float:
+        return self.shape / self.rate ** 2
+
+    def parameters(self) -> Dict:
+        return {'name': 'erlang', 'shape': self.shape, 'rate': self.rate}
+
+
+class Binomial(Distribution):
+    def __init__(self, n: int, p: float = 0.5, shift: float = 0):
+        """This class is the binomial distribution with n trials of success probability p, shifted by shift (our
+        serving times are Binomial(bus_stops, 1/2) + 1)"""
+
+        self.n = n
+        self.p = p
+        self.shift = shift
+
+    def inverse(self, random_numbers) -> np.ndarray:
+        return binomial_inverse(random_numbers, n = self.n, p = self.p) + self.shift
+
+    def mean(self) -> float:
+        return self.n * self.p + self.shift
+
+    def variance(self) -> float:
+        return self.n * self.p * (1 - self.p)
+
+    def parameters(self) -> Dict:
+        return {'name': 'binomial', 'n': self.n, 'p': self.p, 'shift': self.shift}
+
+
+class Empirical(Distribution):
+    def __init__(self, values):
+        """This class is the empirical distribution of observed values (e.g. measured boarding times), which
+        trace-driven runs resample from"""
+
+        self.values = np.sort(np.asarray(values, dtype = float))
+
+        if not len(self.values):
+            raise ValueError("An empirical distribution needs at least one value")
+
+    @classmethod
+    def from_csv(cls, path: str, column: str) -> 'Empirical':
+        """This function reads the values of an empirical distribution from a column of a csv file"""
+
+        return cls(pd.read_csv(path, usecols = [column])[column].dropna().to_numpy())
+
+    def inverse(self, random_numbers) -> np.ndarray:
+        # Inverted empirical CDF, each value having probability 1 / len(values)
+        indices = np.minimum((np.asarray(random_numbers) * len(self.values)).astype(np.int64), len(self.values) - 1)
+
+        return self.values[indices]
+
+    def mean(self) -> float:
+        return float(self.values.mean())
+
+    def variance(self) -> float:
+        return float(self.values.var())
+
+    def parameters(self) -> Dict:
+        return {'name': 'empirical', 'values': self.values.tolist()}
+
+
+class ArrivalProcess(Distribution):
+    """This class is the interface of arrival processes whose rate varies with time. Their samples along the last
+    axis are the successive interarrival times from time 0, and the simulation is fed their arrival times directly"""
+
+    stationary = False
+
+    @abstractmethod
+    def sample_arrival_times(
+        self, num_samples: Shape = None, rng: np.random.Generator = None, start_time: float = 0.0) -> np.ndarray:
+
+        """This function draws the first num_samples arrival times after start_time along the last axis"""
+
+    def sample(self, num_samples: Shape = None, rng: np.random.Generator = None) -> np.ndarray:
+        if self.invertible:
+            return super().sample(num_samples, rng)
+
+        arrival_times = self.sample_arrival_times(1 if num_samples is None else num_samples, rng)
+        interarrival_times = np.diff(arrival_times, axis = -1, prepend = 0)
+
+        return interarrival_times[..., 0] if num_samples is None else interarrival_times
+
+
+class TimeVaryingPoisson(ArrivalProcess):
+    invertible = False
+
+    def __init__(self, rate: Callable, max_rate: float, block_size: int = 1024):
+        """This class is a Poisson arrival process whose rate rate(t) varies with time, bounded by max_rate, drawn by
+        thinning: candidate arrivals of a homogeneous process with rate max_rate are generated in vectorized blocks
+        of block_size, and each one is kept with probability rate(t) / max_rate. rate must accept an array of times"""
+
+        self.rate = rate
+        self.max_rate = max_rate
+        self.block_size = block_size
+
+    def inverse(self, random_numbers) -> np.ndarray:
+        # Thinning consumes a random number of uniforms per arrival, so it isn't an inverse transform
+        raise ValueError(f"{type(self).__name__} has no inverse transform, its samples are drawn by thinning")
+
+    def _thin(self, num_samples: int, rng: np.random.Generator, start_time: float) -> np.ndarray:
+        """This function draws the first num_samples arrival times after start_time by thinning"""
+
+        arrival_times = []
+        accepted = 0
+        time = start_time
+
+        while accepted < num_samples:
+            candidates = time + np.cumsum(exponential_inverse(rng.random(self.block_size), self.max_rate))
+            rates = np.asarray(self.rate(candidates), dtype = float)
+
+            if np.any(rates > self.max_rate):
+                raise ValueError(f"The arrival rate exceeds its bound max_rate = {self.max_rate}")
+
+            kept = candidates[rng.random(self.block_size) * self.max_rate < rates]
+            arrival_times.append(kept)
+            accepted += len(kept)
+            time = candidates[-1]
+
+        return np.concatenate(arrival_times)[:num_samples]
+
+    def sample_arrival_times(
+        self, num_samples: Shape = None, rng: np.random.Generator = None, start_time: float = 0.0) -> np.ndarray:
+
+        rng = get_generator(rng)
+        shape = tuple(np.atleast_1d(num_samples))
+
+        return np.stack([
+            self._thin(shape[-1], rng, start_time) for _ in range(int(np.prod(shape[:-1])))]).reshape(shape)
+
+
+class PiecewiseConstantPoisson(ArrivalProcess):
+    def __init__(self, breakpoints, rates):
+        """This class is a Poisson arrival process whose rate is rates[i] from breakpoints[i] until breakpoints[i + 1]
+        (e.g. hourly demand over a day), the last rate carrying on after the last breakpoint. Arrival times are drawn
+        by inverting the cumulative intensity Lambda(t), which is piecewise linear: the arrival times of a unit-rate
+        process are mapped through Lambda^-1 with one vectorized search, so uniform random numbers map to arrivals
+        and the variance reduction techniques apply to them"""
+
+        self.breakpoints = np.asarray(breakpoints, dtype = float)
+        self.rates = np.asarray(rates, dtype = float)
+
+        if len(self.breakpoints) != len(self.rates) or self.breakpoints[0] != 0:
+            raise ValueError("There must be one rate per breakpoint, the first breakpoint being 0")
+
+        if np.any(np.diff(self.breakpoints) <= 0) or np.any(self.rates < 0):
+            raise ValueError("The breakpoints must be increasing and the rates non-negative")
+
+        # Cumulative intensity at each breakpoint
+        self.cumulative_intensities = np.concatenate([[0], np.cumsum(self.rates[:-1] * np.diff(self.breakpoints))])
+
+    def cumulative_intensity(self, times) -> np.ndarray:
+        """This function returns Lambda(t), the expected number of arrivals by each time"""
+
+        times = np.asarray(times, dtype = float)
+        piece = np.searchsorted(self.breakpoints, times, side = 'right') - 1
+
+        return self.cumulative_intensities[piece] + self.rates[piece] * (times - self.breakpoints[piece])
+
+    def inverse_cumulative_intensity(self, intensities) -> np.ndarray:
+        """This function returns Lambda^-1, the first time by which the given expected numbers of arrivals are reached
+        (infinite when the rate stays at 0)"""
+
+        intensities = np.asarray(intensities, dtype = float)
+        # Pieces with a rate of 0 don't increase the intensity and are skipped
+        piece = np.searchsorted(self.cumulative_intensities, intensities, side = 'right') - 1
+
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            times = self.breakpoints[piece] + (intensities - self.cumulative_intensities[piece]) / self.rates[piece]
+
+        return np.where(np.isnan(times), float('inf'), times)
+
+    def arrival_times_inverse(self, random_numbers, start_time: float = 0.0) -> np.ndarray:
+        """This function maps uniform random numbers to the successive arrival times after start_time along the last
+        axis"""
+
+        unit_arrival_times = self.cumulative_intensity(start_time) + np.cumsum(
+            exponential_inverse(random_numbers, 1), axis = -1)
+
+        return self.inverse_cumulative_intensity(unit_arrival_times)
+
+    def inverse(self, random_numbers) -> np.ndarray:
+        with np.errstate(invalid = 'ignore'):
+            interarrival_times = np.diff(self.arrival_times_inverse(random_numbers), axis = -1, prepend = 0)
+
+        # No more arrivals once the rate stays at 0
+        return np.where(np.isnan(interarrival_times), float('inf'), interarrival_times)
+
+    def sample_arrival_times(
+        self, num_samples: Shape = None, rng: np.random.Generator = None, start_time: float = 0.0) -> np.ndarray:
+
+        return self.arrival_times_inverse(generate_uniform(num_samples, rng), start_time)
+
+    def parameters(self) -> Dict:
+        return {
+            'name': 'piecewise_constant_poisson', 'breakpoints': self.breakpoints.tolist(),
+            'rates': self.rates.tolist()}
+
+
+class CustomerClasses(Distribution):
+    def __init__(self, classes: Dict[str, Tuple[float, Distribution]]):
+        """This class is the serving time of customers of several classes, given as {name: (probability, serving
+        time distribution)}. A uniform random number u picks the class k whose interval [c_(k-1), c_k) of the
+        cumulative probabilities contains it, and (u - c_(k-1)) / p_k, uniform within that interval, is mapped
+        through the inverse transform of the class. The samples of each class are transformed together, so the cost
+        is one vectorized call per class rather than per customer, and stratifying u also stratifies the classes"""
+
+        self.names = list(classes)
+        self.probabilities = np.array([probability for probability, _ in classes.values()], dtype = float)
+        self.distributions = [distribution for _, distribution in classes.values()]
+
+        if not np.isclose(self.probabilities.sum(), 1):
+            raise ValueError(f"The class probabilities sum to {self.probabilities.sum()} instead of 1")
+
+        if not all(distribution.invertible and distribution.stationary for distribution in self.distributions):
+            raise ValueError("The serving time distributions of the classes must be invertible and stationary")
+
+        self.cumulative_probabilities = np.cumsum(self.probabilities)
+        self.cumulative_probabilities[-1] = 1.0
+
+    def classify(self, random_numbers) -> np.ndarray:
+        """This function returns the class (index in names) that inverse picks for each uniform random number, which
+        the simulation records for every customer (see generate_inputs)"""
+
+        return np.searchsorted(self.cumulative_probabilities, random_numbers, side = 'right')
+
+    def inverse(self, random_numbers) -> np.ndarray:
+        random_numbers = np.asarray(random_numbers, dtype = float)
+        classes = self.classify(random_numbers)
+        lower_probabilities = self.cumulative_probabilities - self.probabilities
+        samples = np.empty(random_numbers.shape)
+
+        for customer_class, distribution in enumerate(self.distributions):
+            in_class = classes == customer_class
+            samples[in_class] = distribution.inverse(
+                (random_numbers[in_class] - lower_probabilities[customer_class]) / self.probabilities[customer_class])
+
+        return samples
+
+    def mean(self) -> float:
+        return float(sum(
+            probability * distribution.mean()
+            for probability, distribution in zip(self.probabilities, self.distributions)))
+
+    def variance(self) -> float:
+        # Law of total variance
+        second_moment = sum(
+            probability * (distribution.variance() + distribution.mean() ** 2)
+            for probability, distribution in zip(self.probabilities, self.distributions))
+
+        return float(second_moment - self.mean() ** 2)
+
+    def parameters(self) -> Dict:
+        class_parameters = [distribution.parameters() for distribution in self.distributions]
+
+        if any(parameters is None for parameters in class_parameters):
+            return None
+
+        return {
+            'name': 'customer_classes',
+            'classes': {
+                name: [probability, parameters]
+                for name, probability, parameters in zip(self.names, self.probabilities.tolist(), class_parameters)}}
+
+
+# Distributions by name, for get_distribution
+DISTRIBUTIONS = {
+    'exponential': Exponential,
+    'erlang': Erlang,
+    'binomial': Binomial,
+    'empirical': Empirical,
+    'time_varying_poisson': TimeVaryingPoisson,
+    'piecewise_constant_poisson': PiecewiseConstantPoisson,
+    'customer_classes': CustomerClasses,
+}
+
+
+def get_distribution(name: str, **parameters) -> Distribution:
+    """This function returns the distribution of the registry with the given name and parameters, e.g.
+    get_distribution('erlang', shape = 2, rate = 1)"""
+
+    if name not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution {name!r}, expected one of {list(DISTRIBUTIONS)}")
+
+    return DISTRIBUTIONS[name](**parameters)
+
+
+def get_input_distributions(
+    arrival_lambda: float, bus_stops: int, interarrival_distribution: Distribution = None,
+    serving_distribution: Distribution = None) -> Tuple[Distribution, Distribution]:
+
+    """This function returns the given interarrival and serving time distributions, defaulting to our model's
+    Exponential(arrival_lambda) interarrival times and Binomial(bus_stops, 1/2) + 1 serving times"""
+
+    return (
+        Exponential(arrival_lambda) if interarrival_distribution is None else interarrival_distribution,
+        Binomial(bus_stops, 0.5, shift = 1) if serving_distribution is None else serving_distribution)
+
+
+def get_distribution_parameters(
+    interarrival_distribution: Distribution = None, serving_distribution: Distribution = None) -> Dict:
+
+    """This function returns the parameters of the given input distributions to identify an experiment in cache keys
+    and file names (empty for our default model, so its keys don't change). A distribution that can't be described
+    has None parameters"""
+
+    return {
+        f'{name}_distribution': distribution.parameters()
+        for name, distribution in (('interarrival', interarrival_distribution), ('serving', serving_distribution))
+        if distribution is not None}
@@ -0,0 +1,146 @@
+from typing import Dict, List
+import numpy as np
+import scipy.stats as stats
+from helpers.simulation import Simulation
+from utils.inverse_transform_sampling import (
+    generate_exponential, generate_binomial, exponential_log_likelihood_ratio, binomial_log_likelihood_ratio)
+from utils.parallel import spawn_seeds, chunk, parallel_map
+
+"""File containing the importance sampling estimator of the tail probability of the waiting time"""
+
+# Success probability of the binomial number of stops travelled by a customer
+SERVING_P = 0.5
+
+
+def generate_tilted_inputs(
+    arrival_lambda: float, bus_stops: int, serving_limit: int, tilted_arrival_lambda: float, tilted_p: float,
+    rng: np.random.Generator = None):
+
+    """
+    This function draws the interarrival and serving times of one replication from the tilted distributions
+    Parameters
+    ----------
+    arrival_lambda : the nominal arrival rate
+    bus_stops : number of bus stops
+    serving_limit : number of interarrival and serving times to draw
+    tilted_arrival_lambda : the arrival rate the interarrival times are drawn with
+    tilted_p : the success probability the binomial serving times are drawn with
+    rng : the random number generator to use
+
+    Returns
+    -------
+    The interarrival times, the serving times, and their log-likelihood ratios (nominal over tilted density)
+    """
+
+    interarrival_times = generate_exponential(tilted_arrival_lambda, serving_limit, rng)
+    stops_travelled = generate_binomial(bus_stops, tilted_p, serving_limit, rng)
+
+    return (
+        interarrival_times, stops_travelled + 1,
+        exponential_log_likelihood_ratio(interarrival_times, arrival_lambda, tilted_arrival_lambda),
+        binomial_log_likelihood_ratio(stops_travelled, bus_stops, SERVING_P, tilted_p))
+
+
+def run_weighted_replications(
+    replication_seeds: List[np.random.SeedSequence], arrival_lambda: float, bus_seats: int, bus_stops: int,
+    threshold: float, tilted_arrival_lambda: float, tilted_p: float, serving_limit: int = 100,
+    time_limit: float = float('inf'), event_calendar: str = 'list') -> List[Dict]:
+
+    """This function simulates one replication per seed under the tilted distributions and returns, for each, the
+    sums over the customers who boarded of their likelihood ratios, with and without the indicator of waiting longer
+    than the threshold. The likelihood ratio of a customer is the one of the times used until they boarded, which
+    decides whether they waited longer than the threshold"""
+
+    replication_results = []
+
+    for replication_seed in replication_seeds:
+
+        interarrival_times, serving_times, interarrival_ratios, serving_ratios = generate_tilted_inputs(
+            arrival_lambda, bus_stops, serving_limit, tilted_arrival_lambda, tilted_p,
+            np.random.default_rng(replication_seed))
+        simulation = Simulation(
+            bus_seats, bus_stops, interarrival_times.tolist(), serving_times.tolist(), event_calendar = event_calendar,
+            log_likelihood_ratios = (interarrival_ratios.tolist(), serving_ratios.tolist()))
+
+        while simulation.total_served < serving_limit and simulation.time < time_limit:
+            simulation.time_step()
+
+        customer_history = simulation.get_customer_history()
+        boarded = np.isfinite(customer_history['boarded_time'])
+        likelihood_ratios = np.exp(customer_history['log_likelihood_ratio'][boarded])
+        tail = customer_history['waiting_time'][boarded] > threshold
+
+        replication_results.append({
+            'weighted_tail_customers': likelihood_ratios[tail].sum(),
+            'weighted_customers': likelihood_ratios.sum(),
+            'tail_customers': int(tail.sum()),
+        })
+
+    return replication_results
+
+
+def _run_weighted_chunk(task) -> List[Dict]:
+    """This function runs run_weighted_replications on a chunk of seeds in a worker"""
+
+    replication_seeds, replication_kwargs = task
+
+    return run_weighted_replications(replication_seeds, **replication_kwargs)
+
+
+def run_importance_sampling(
+    iterations: int, arrival_lambda: float, bus_seats: int, bus_stops: int, threshold: float,
+    tilted_arrival_lambda: float = None, tilted_p: float = None, serving_limit: int = 100,
+    time_limit: float = float('inf'), confidence: float = 0.95, event_calendar: str = 'list', seed = None,
+    workers: int = 1, chunk_size: int = 100) -> Dict:
+
+    """This function estimates the probability that a customer waits longer than the threshold, P(W > threshold),
+    by importance sampling. Replications are simulated with a tilted arrival rate and binomial success probability
+    (typically higher than the nominal arrival_lambda and 1/2, so that long waits stop being rare), and customers are
+    weighted by the likelihood ratio of the nominal to the tilted distributions. Without tilts, this is the naive
+    Monte Carlo estimator.
+
+    The estimate is the ratio of the weighted numbers of customers waiting longer than the threshold and of customers
+    boarding, over every replication. Its standard error comes from the delta method, and the relative error is the
+    standard error over the estimate: a good tilt keeps it small for probabilities that naive replications would
+    hardly ever observe. Seeded results are reproducible whatever the number of workers"""
+
+    tilted_arrival_lambda = arrival_lambda if tilted_arrival_lambda is None else tilted_arrival_lambda
+    tilted_p = SERVING_P if tilted_p is None else tilted_p
+
+    replication_kwargs = {
+        'arrival_lambda': arrival_lambda, 'bus_seats': bus_seats, 'bus_stops': bus_stops, 'threshold': threshold,
+        'tilted_arrival_lambda': tilted_arrival_lambda, 'tilted_p': tilted_p, 'serving_limit': serving_limit,
+        'time_limit': time_limit, 'event_calendar': event_calendar}
+    tasks = [
+        (replication_seeds, replication_kwargs)
+        for replication_seeds in chunk(spawn_seeds(seed, iterations), chunk_size)]
+    replication_results = [
+        replication_result
+        for chunk_results in parallel_map(_run_weighted_chunk, tasks, workers)
+        for replication_result in chunk_results]
+
+    weighted_tail_customers = np.array([result['weighted_tail_customers'] for result in replication_results])
+    weighted_customers = np.array([result['weighted_customers'] for result in replication_results])
+
+    tail_probability = weighted_tail_customers.sum() / weighted_customers.sum()
+    # Delta method for the ratio estimator
+    residuals = weighted_tail_customers - tail_probability * weighted_customers
+    standard_error = (
+        residuals.std(ddof = 1) / np.sqrt(iterations) / weighted_customers.mean() if iterations > 1 else float('inf'))
+
+    return {
+        'arrival_lambda': arrival_lambda,
+        'bus_seats': bus_seats,
+        'bus_stops': bus_stops,
+        'threshold': threshold,
+        'iterations': iterations,
+        'tilted_arrival_lambda': tilted_arrival_lambda,
+        'tilted_p': tilted_p,
+        'tail_probability': tail_probability,
+        'standard_error': standard_error,
+        'relative_error': standard_error / tail_probability if tail_probability > 0 else float('inf'),
+        'half_width': stats.norm.ppf((1 + confidence) / 2) * standard_error,
+        'confidence': confidence,
+        # Replications that saw at least one customer wait longer than the threshold under the tilted distributions
+        'tail_replications': sum(result['tail_customers'] > 0 for result in replication_results),
+    }
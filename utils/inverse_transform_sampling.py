@@ -1,7 +1,7 @@
+from functools import lru_cache
+from typing import Tuple, Union
 import numpy as np
 import scipy.stats as stats
-import random
-import pandas as pd
 
 # variance reduction techniques:
 # original: MC
@@ -9,167 +9,330 @@ import pandas as pd
 # 2: variance reduction by conditioning
 # control variates
 # stratified sampling
-# importance sampling
+# importance sampling (utils/importance_sampling.py)
+
+# Every generator takes num_samples, either an integer for one replication or a (replications, samples) shape for a
+# batch of replications (samples are then drawn independently for every row), and an optional numpy Generator.
+# Without num_samples, generate_exponential, generate_normal and generate_binomial return a single sample.
+
+Shape = Union[int, Tuple[int, ...]]
+
+# Generator used by the samplers when none is given
+_default_generator = np.random.default_rng()
+
+def get_generator(rng: np.random.Generator = None) -> np.random.Generator:
+    """This function returns the given random number generator, or the module's default one.
+
+    Parameters----
+    rng : a numpy Generator, or None for the default generator
+    """
+
+    return _default_generator if rng is None else rng
+
+######################## -------- UNIFORM SAMPLES -------- ########################
+
+def generate_uniform(num_samples: Shape = None, rng: np.random.Generator = None):
+    """This function generates uniform random numbers on [0, 1) that feed the inverse transforms.
+
+    Parameters----
+    num_samples: number (or shape) of samples to be generated
+    rng: the random number generator to use
+    """
+
+    return get_generator(rng).random(num_samples)
+
+
+def generate_uniform_antithetic(num_samples: Shape, rng: np.random.Generator = None):
+    """This function generates uniform random numbers in antithetic pairs (U, 1 - U) along the last axis.
+
+    Parameters----
+    num_samples: number (or shape) of samples to be generated
+    rng: the random number generator to use
+    """
+
+    shape = np.atleast_1d(num_samples)
+    pairs = get_generator(rng).random(tuple(shape[:-1]) + (-(-shape[-1] // 2),))
+
+    # Interleave U and 1 - U and drop the last 1 - U if an odd number of samples is required
+    return np.stack([pairs, 1 - pairs], axis = -1).reshape(tuple(shape[:-1]) + (-1,))[..., :shape[-1]]
+
+
+def generate_uniform_stratified(num_samples: Shape, bins: int, rng: np.random.Generator = None):
+    """This function generates uniform random numbers with num_samples // bins of them in each of the equal strata
+    [bin / bins, (bin + 1) / bins), in random order along the last axis. The num_samples % bins samples left over go
+    to distinct strata picked at random, so exactly num_samples samples are returned.
+
+    Parameters----
+    num_samples: number (or shape) of samples to be generated
+    bins: number of strata
+    rng: the random number generator to use
+    """
+
+    rng = get_generator(rng)
+    shape = np.atleast_1d(num_samples)
+    batch_shape = tuple(shape[:-1])
+
+    strata = np.broadcast_to(np.repeat(np.arange(bins), shape[-1] // bins), batch_shape + (shape[-1] // bins * bins,))
+
+    if shape[-1] % bins:
+        # Random distinct strata for the remainder, drawn independently along the last axis
+        leftover_strata = rng.random(batch_shape + (bins,)).argsort(axis = -1)[..., :shape[-1] % bins]
+        strata = np.concatenate([strata, leftover_strata], axis = -1)
+
+    return rng.permuted((strata + rng.random(strata.shape)) / bins, axis = -1)
+
+
+def generate_uniform_latin_hypercube(num_samples: Shape, rng: np.random.Generator = None):
+    """This function generates uniform random numbers stratified across the first axis (the replications): for every
+    other index, the num_samples[0] values fall one in each of the equal strata [r / R, (r + 1) / R), with the strata
+    assigned by an independent random permutation. Each replication is a point of a Latin hypercube whose dimensions
+    are its inputs, and two calls give independent dimensions (e.g. interarrival and serving uniforms).
+
+    Parameters----
+    num_samples: number (or shape) of samples to be generated, replications first
+    rng: the random number generator to use
+    """
+
+    rng = get_generator(rng)
+    shape = tuple(np.atleast_1d(num_samples))
+    strata = np.broadcast_to(np.arange(shape[0]).reshape((-1,) + (1,) * (len(shape) - 1)), shape)
+
+    return (rng.permuted(strata, axis = 0) + rng.random(shape)) / shape[0]
 
 ######################## -------- EXPONENTIAL SAMPLES -------- ########################
 
-def generate_exponential(lmbda: float):
-    """This function generates an exponential random variable with the provided parameters using inverse transform.
+def exponential_inverse(random_numbers, lmbda: float):
+    """This function is the inverse transform of the exponential distribution, applied elementwise.
 
     Parameters----
+    random_numbers : uniform random numbers on [0, 1)
     lmbda : the 1/scale parameter for your exponential distribution
     """
 
-    random_number = np.random.uniform(low = 0.0, high = 1.0)
-    return - (1 / lmbda) * np.log(random_number)
+    return - (1 / lmbda) * np.log(random_numbers)
 
 
-def generate_exponential_antithetic(lmbda: float, num_samples: int):
+def generate_exponential(lmbda: float, num_samples: Shape = None, rng: np.random.Generator = None):
     """This function generates an exponential random variable with the provided parameters using inverse transform.
-    Uses antithetic variables to reduce variance.
 
     Parameters----
     lmbda : the 1/scale parameter for your exponential distribution
-    num_samples: total number of samples to be generated
+    num_samples: number (or shape) of samples to be generated, None for a single sample
+    rng: the random number generator to use
     """
 
-    samples = []
-
-    for _ in range(num_samples // 2):
-        random_number = np.random.uniform(low = 0.0, high = 1.0)
-        samples.append(- (1 / lmbda) * np.log(random_number))
-        samples.append(- (1 / lmbda) * np.log(1 - random_number))
-    
-    return samples
+    return exponential_inverse(generate_uniform(num_samples, rng), lmbda)
 
 
-def generate_exponential_control_variate(lmbda: float, num_samples: int):
+def generate_exponential_antithetic(lmbda: float, num_samples: Shape, rng: np.random.Generator = None):
     """This function generates an exponential random variable with the provided parameters using inverse transform.
-    Uses control variate to reduce variance.
-    Uses U+1 (with mean 3/2) as the control variate.
+    Uses antithetic variables to reduce variance.
 
     Parameters----
     lmbda : the 1/scale parameter for your exponential distribution
-    num_samples: total number of samples to be generated
+    num_samples: number (or shape) of samples to be generated
+    rng: the random number generator to use
     """
 
-    samples = []
-    controls = []
+    return exponential_inverse(generate_uniform_antithetic(num_samples, rng), lmbda)
 
-    for _ in range(num_samples):
-        random_number = np.random.uniform(low = 0.0, high = 1.0)
-        samples.append(- (1 / lmbda) * np.log(random_number))
-        controls.append(random_number+1)
 
-    # Regression of samples on controls
-    df = pd.DataFrame({'X': controls, 'Y': samples})
+def control_variate_adjustment(samples, random_numbers):
+    """This function shifts exponential samples by the control variate U+1 (with mean 3/2) of the uniform random
+    numbers they were generated from, with the regression coefficient estimated along the last axis.
 
-    # Calculate the mean of X and y
-    controls_mean = np.mean(controls)
-    samples_mean = np.mean(samples)
+    Parameters----
+    samples : the exponential samples
+    random_numbers : the uniform random numbers the samples were generated from
+    """
 
-    # Calculate the terms needed for the numator and denominator of beta
-    df['xycov'] = (df['X'] - controls_mean) * (df['Y'] - samples_mean)
-    df['xvar'] = (df['X'] - controls_mean) ** 2
+    controls = random_numbers + 1
 
-    # Calculate beta and alpha
-    beta = df['xycov'].sum() / df['xvar'].sum()
-    alpha = samples_mean - (beta * controls_mean)
+    # Regression of samples on controls, along the samples of each replication
+    controls_mean = controls.mean(axis = -1, keepdims = True)
+    samples_mean = samples.mean(axis = -1, keepdims = True)
+    beta = (
+        ((controls - controls_mean) * (samples - samples_mean)).sum(axis = -1, keepdims = True)
+        / ((controls - controls_mean) ** 2).sum(axis = -1, keepdims = True))
 
     c = - beta
 
-    for i in range(num_samples):
-        samples[i] = samples[i] + c * (controls_mean - 1.5)
+    return samples + c * (controls_mean - 1.5)
+
+
+def generate_exponential_control_variate(lmbda: float, num_samples: Shape, rng: np.random.Generator = None):
+    """This function generates an exponential random variable with the provided parameters using inverse transform.
+    Uses control variate to reduce variance.
+    Uses U+1 (with mean 3/2) as the control variate.
+
+    Parameters----
+    lmbda : the 1/scale parameter for your exponential distribution
+    num_samples: number (or shape) of samples to be generated
+    rng: the random number generator to use
+    """
+
+    random_numbers = generate_uniform(num_samples, rng)
 
-    return samples
+    return control_variate_adjustment(exponential_inverse(random_numbers, lmbda), random_numbers)
 
 
-def generate_exponential_stratified(lmbda: float, num_samples: int, bins: int):
+def generate_exponential_stratified(lmbda: float, num_samples: Shape, bins: int, rng: np.random.Generator = None):
     """This function generates an exponential random variable with the provided parameters using inverse transform.
     Uses stratified sampling to reduce variance.
 
     Parameters----
     lmbda : the 1/scale parameter for your exponential distribution
-    num_samples: total number of samples to be generated
+    num_samples: number (or shape) of samples to be generated
     bins: number of strata
+    rng: the random number generator to use
     """
 
-    samples = []
+    return exponential_inverse(generate_uniform_stratified(num_samples, bins, rng), lmbda)
 
-    for bin in range(bins):
-        for _ in range(num_samples // bins):
-            random_number = np.random.uniform(low = bin / bins, high = (bin+1) / bins)
-            sample = - (1 / lmbda) * np.log(random_number)
-            samples.append(sample)
-        
-    random.shuffle(samples)
-    return samples
+
+def generate_exponential_latin_hypercube(lmbda: float, num_samples: Shape, rng: np.random.Generator = None):
+    """This function generates an exponential random variable with the provided parameters using inverse transform.
+    Uses Latin hypercube sampling across the first axis to reduce variance.
+
+    Parameters----
+    lmbda : the 1/scale parameter for your exponential distribution
+    num_samples: number (or shape) of samples to be generated, replications first
+    rng: the random number generator to use
+    """
+
+    return exponential_inverse(generate_uniform_latin_hypercube(num_samples, rng), lmbda)
 
 ######################## -------- NORMAL SAMPLES -------- ########################
 
-def generate_normal(loc: float = 0, scale: float = 1):
+def generate_normal(loc: float = 0, scale: float = 1, num_samples: Shape = None, rng: np.random.Generator = None):
     """This function generates an normal random variable with the provided parameters.
 
     Parameters----
     loc : the mean of your normal distribution
     scale : the standard deviation of your normal distribution
+    num_samples: number (or shape) of samples to be generated, None for a single sample
+    rng: the random number generator to use
     """
 
-    random_number = np.random.uniform(low = 0.0, high = 1.0)
-    return stats.norm.ppf(q = random_number, scale = scale, loc = loc)
+    return stats.norm.ppf(q = generate_uniform(num_samples, rng), scale = scale, loc = loc)
 
 ######################## -------- BINOMIAL SAMPLES -------- ########################
 
-def generate_binomial(n: int, p: float = 0.5):
+@lru_cache(maxsize = 256)
+def binomial_cdf_table(n: int, p: float = 0.5):
+    """This function returns the cumulative probabilities P(X <= k), k = 0..n, of a binomial distribution.
+    Tables are computed once and cached per (n, p), so repeated sweeps over the same bus_stops reuse them.
+
+    Parameters----
+    n : the number of trials
+    p: the probability of a trial being successful
+    """
+
+    table = stats.binom.cdf(np.arange(n + 1), n = n, p = p)
+    # Guard against rounding so that every random number in [0, 1) maps to a value in 0..n
+    table[-1] = 1.0
+    table.flags.writeable = False
+
+    return table
+
+
+def binomial_inverse(random_numbers, n: int, p: float = 0.5):
+    """This function is the inverse transform of the binomial distribution, applied elementwise.
+    The smallest k with P(X <= k) >= u is found by binary search in the cached table of cumulative probabilities.
+
+    Parameters----
+    random_numbers : uniform random numbers on [0, 1)
+    n : the number of trials
+    p: the probability of a trial being successful
+    """
+
+    table = binomial_cdf_table(int(n), float(p))
+
+    return np.searchsorted(table, random_numbers, side = 'left').astype(float)
+
+
+def generate_binomial(n: int, p: float = 0.5, num_samples: Shape = None, rng: np.random.Generator = None):
     """This function generates a binomial random variable with the provided parameters.
 
     Parameters----
     n : the number of trials
     p: the probability of a trial being successful
+    num_samples: number (or shape) of samples to be generated, None for a single sample
+    rng: the random number generator to use
     """
 
-    random_number = np.random.uniform(low = 0.0, high = 1.0)
-    return stats.binom.ppf(q = random_number, n = n, p = p)
-    
+    return binomial_inverse(generate_uniform(num_samples, rng), n, p)
+
 
-def generate_binomial_antithetic(n: int, num_samples: int, p: float = 0.5):
+def generate_binomial_antithetic(n: int, num_samples: Shape, p: float = 0.5, rng: np.random.Generator = None):
     """This function generates a binomial random variable with the provided parameters.
     Uses antithetic variables to reduce variance.
 
     Parameters----
     n : the number of trials
-    num_samples: total number of samples to be generated
+    num_samples: number (or shape) of samples to be generated
     p: the probability of a trial being successful
+    rng: the random number generator to use
     """
 
-    samples = []
+    return binomial_inverse(generate_uniform_antithetic(num_samples, rng), n, p)
 
-    for _ in range(num_samples // 2):
-        random_number = np.random.uniform(low = 0.0, high = 1.0)
-        samples.append(stats.binom.ppf(q = random_number, n = n, p = p))
-        samples.append(stats.binom.ppf(q = 1 - random_number, n = n, p = p))
 
-    return samples
-    
-
-def generate_binomial_stratified(n: int, num_samples: int, bins: int, p: float = 0.5):
+def generate_binomial_stratified(
+    n: int, num_samples: Shape, bins: int, p: float = 0.5, rng: np.random.Generator = None):
     """This function generates a binomial random variable with the provided parameters.
     Uses stratified sampling to reduce variance.
 
     Parameters----
     n : the number of trials
     p: the probability of a trial being successful
-    num_samples: total number of samples to be generated
+    num_samples: number (or shape) of samples to be generated
     bins: number of strata
+    rng: the random number generator to use
+    """
+
+    return binomial_inverse(generate_uniform_stratified(num_samples, bins, rng), n, p)
+
+
+def generate_binomial_latin_hypercube(n: int, num_samples: Shape, p: float = 0.5, rng: np.random.Generator = None):
+    """This function generates a binomial random variable with the provided parameters.
+    Uses Latin hypercube sampling across the first axis to reduce variance.
+
+    Parameters----
+    n : the number of trials
+    p: the probability of a trial being successful
+    num_samples: number (or shape) of samples to be generated, replications first
+    rng: the random number generator to use
+    """
+
+    return binomial_inverse(generate_uniform_latin_hypercube(num_samples, rng), n, p)
+
+######################## -------- IMPORTANCE SAMPLING -------- ########################
+
+def exponential_log_likelihood_ratio(samples, lmbda: float, tilted_lmbda: float):
+    """This function returns the log of the ratio of the exponential densities with rates lmbda and tilted_lmbda at
+    samples drawn with rate tilted_lmbda, applied elementwise.
+
+    Parameters----
+    samples : the exponential samples
+    lmbda : the 1/scale parameter of the nominal distribution
+    tilted_lmbda : the 1/scale parameter the samples were drawn with
     """
 
-    samples = []
+    return np.log(lmbda / tilted_lmbda) - (lmbda - tilted_lmbda) * np.asarray(samples)
+
+
+def binomial_log_likelihood_ratio(samples, n: int, p: float, tilted_p: float):
+    """This function returns the log of the ratio of the binomial probabilities with success probabilities p and
+    tilted_p at samples drawn with tilted_p, applied elementwise.
+
+    Parameters----
+    samples : the binomial samples
+    n : the number of trials
+    p : the probability of a trial being successful under the nominal distribution
+    tilted_p : the probability of a trial being successful the samples were drawn with
+    """
 
-    for bin in range(bins):
-        for _ in range(num_samples // bins):
-            random_number = np.random.uniform(low = bin / bins, high = (bin+1) / bins)
-            sample = stats.binom.ppf(q = random_number, n = n, p = p)
-            samples.append(sample)
+    samples = np.asarray(samples)
 
-    random.shuffle(samples)
-    return samples
\ No newline at end of file
+    return samples * np.log(p / tilted_p) + (n - samples) * np.log((1 - p) / (1 - tilted_p))
@@ -0,0 +1,132 @@
+from functools import partial
+from typing import Dict, List, Sequence, Union
+import numpy as np
+from helpers.network import Network
+from helpers.variate_stream import VariateStream
+from utils.distributions import Distribution, get_input_distributions
+from utils.parallel import spawn_seeds, chunk, parallel_map
+
+"""File containing the functions to simulate a bus route with many stops and buses (see helpers/network.py)"""
+
+# Per-run statistics of Network.calculate_statistics summarised across replications
+NETWORK_OUTPUTS = (
+    'average_waiting_time', 'average_riding_time', 'average_queue_length', 'average_customers_upon_arrival',
+    'left_behind')
+
+
+def generate_arrival_stream(
+    interarrival_distribution: Distribution, rng: np.random.Generator = None, block_size: int = 1024) -> VariateStream:
+
+    """This function returns a lazy stream of the absolute arrival times at a stop, drawn in blocks that carry on
+    from the last arrival of the previous block. Stationary distributions give the interarrival times, and arrival
+    processes (see utils/distributions.ArrivalProcess) are drawn from the last arrival time, so their rate follows the
+    time of day however long the run"""
+
+    last_arrival_time = 0.0
+
+    def sampler(num_samples: int, rng: np.random.Generator):
+        nonlocal last_arrival_time
+
+        if interarrival_distribution.stationary:
+            arrival_times = last_arrival_time + np.cumsum(interarrival_distribution.sample(num_samples, rng))
+        else:
+            arrival_times = interarrival_distribution.sample_arrival_times(num_samples, rng, last_arrival_time)
+
+        last_arrival_time = arrival_times[-1]
+
+        return arrival_times
+
+    return VariateStream(sampler, block_size, rng)
+
+
+def run_network_simulation(
+    bus_seats: int, route_stops: int, headway: float, time_limit: float, arrival_lambda: float = 1.0,
+    bus_stops: int = 2, travel_times: Union[float, Sequence[float]] = 1.0, boarding_time: float = 0.0,
+    buses: int = None, interarrival_distribution: Union[Distribution, List[Distribution]] = None,
+    ride_distribution: Distribution = None, rng: np.random.Generator = None, verbose: bool = False) -> Dict:
+
+    """
+    This function simulates a bus route until time_limit and returns the statistics of Network.calculate_statistics
+    Parameters
+    ----------
+    bus_seats : number of seats on each bus
+    route_stops : number of stops on the route
+    headway : time between two buses leaving the first stop
+    time_limit : time at which the run stops, which must be finite as arrivals are streamed
+    arrival_lambda : arrival rate of passengers at each stop, with exponential interarrival times by default
+    bus_stops : passengers ride Binomial(bus_stops, 1/2) + 1 stops by default, as in our single-queue model
+    travel_times : time from each stop to the next one (or the same for every stop)
+    boarding_time : time a bus dwells at a stop per boarding passenger
+    buses : number of buses sent along the route, None for one every headway until time_limit
+    interarrival_distribution : the interarrival distribution or arrival process of every stop, or a list with one
+                                per stop but the last (see utils/distributions)
+    ride_distribution : the distribution of the number of stops passengers ride
+    rng : the random number generator to use
+
+    Returns
+    -------
+    A dictionary with the average waiting, riding and queue statistics of the run and counts of passengers and buses
+    """
+
+    if not isinstance(interarrival_distribution, (list, tuple)):
+        interarrival_distribution = [interarrival_distribution] * (route_stops - 1)
+
+    distributions = [
+        get_input_distributions(arrival_lambda, bus_stops, stop_distribution, ride_distribution)
+        for stop_distribution in interarrival_distribution]
+
+    # Inputs are drawn lazily, so the run is only bounded by time_limit
+    arrival_times = [generate_arrival_stream(stop_distribution, rng) for stop_distribution, _ in distributions]
+    ride_lengths = [
+        VariateStream(stop_ride_distribution.sample, rng = rng) for _, stop_ride_distribution in distributions]
+
+    network = Network(
+        bus_seats, route_stops, arrival_times, ride_lengths, headway, travel_times, boarding_time, buses, verbose)
+    network.run(time_limit)
+
+    if verbose:
+        print("\nSimulation complete.")
+        print(f"Total arrivals is {network.total_arrivals} with {network.total_served} actually served.")
+
+    return network.calculate_statistics(time_limit)
+
+
+def run_network_replications(replication_seeds: List[np.random.SeedSequence], **network_kwargs) -> List[Dict]:
+    """This function runs run_network_simulation once per seed and returns the per-replication results"""
+
+    return [
+        run_network_simulation(**network_kwargs, rng = np.random.default_rng(replication_seed))
+        for replication_seed in replication_seeds]
+
+
+def run_network_experiment(
+    iterations: int, bus_seats: int, route_stops: int, headway: float, time_limit: float, seed = None,
+    workers: int = 1, chunk_size: int = 100, **network_kwargs) -> Dict:
+
+    """This function runs iterations replications of run_network_simulation (with its keyword arguments) on a pool of
+    workers processes and summarises the mean and standard deviation of each output across them. Replication i is
+    seeded with the i-th child of SeedSequence(seed), so results are reproducible whatever the number of workers"""
+
+    replicate = partial(
+        run_network_replications, bus_seats = bus_seats, route_stops = route_stops, headway = headway,
+        time_limit = time_limit, **network_kwargs)
+    replication_results = [
+        replication_result
+        for chunk_results in parallel_map(replicate, chunk(spawn_seeds(seed, iterations), chunk_size), workers)
+        for replication_result in chunk_results]
+
+    summary = {
+        'iterations': iterations,
+        'bus_seats': bus_seats,
+        'route_stops': route_stops,
+        'headway': headway,
+        'time_limit': time_limit,
+    }
+
+    for output in NETWORK_OUTPUTS:
+        values = [result[output] for result in replication_results]
+        name = output.replace('average_', '')
+        summary[f'{name}_mean'] = np.mean(values)
+        summary[f'{name}_std'] = np.std(values)
+
+    return summary
@@ -0,0 +1,56 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Sequence, Union
+import numpy as np
+
+"""File containing the helpers to run independent simulation tasks on a pool of processes"""
+
+
+def spawn_seeds(seed: Union[int, np.random.SeedSequence, None], count: int) -> List[np.random.SeedSequence]:
+    """
+    This function spawns one independent seed per task so that results don't depend on how tasks are scheduled
+    Parameters
+    ----------
+    seed : root seed (an integer or a SeedSequence), None for fresh entropy from the operating system
+    count : number of tasks that need a seed
+
+    Returns
+    -------
+    A list of count child SeedSequences, the same for the same root seed
+    """
+
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+
+    return seed.spawn(count)
+
+
+def chunk(tasks: Sequence, chunk_size: int) -> List[Sequence]:
+    """This function splits the tasks into consecutive chunks of at most chunk_size tasks"""
+
+    return [tasks[start:start + chunk_size] for start in range(0, len(tasks), chunk_size)]
+
+
+def parallel_map(function: Callable, tasks: Sequence, workers: int = 1, chunk_size: int = 1) -> list:
+    """
+    This function applies the function to every task, in a pool of worker processes when workers is not 1
+    Parameters
+    ----------
+    function : a picklable (module level) function taking one task
+    tasks : the tasks to run
+    workers : number of worker processes, None to use every CPU and 1 to run in the current process
+    chunk_size : number of tasks sent to a worker at a time
+
+    Returns
+    -------
+    The results of the tasks, in the order of the tasks
+    """
+
+    if workers is None:
+        workers = os.cpu_count()
+
+    if workers == 1 or len(tasks) <= 1:
+        return [function(task) for task in tasks]
+
+    with ProcessPoolExecutor(max_workers = min(workers, len(tasks))) as executor:
+        return list(executor.map(function, tasks, chunksize = chunk_size))
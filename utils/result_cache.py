@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import tempfile
+from functools import lru_cache
+from typing import Dict, Optional
+import numpy as np
+
+"""File containing the on-disk cache of experiment results, so unchanged grid points aren't simulated again"""
+
+# Packages whose source decides the results of an experiment
+SOURCE_PACKAGES = ('helpers', 'utils')
+
+
+@lru_cache(maxsize = None)
+def get_code_version(root: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) -> str:
+    """
+    This function fingerprints the source code of the simulation, so cached results are invalidated by code changes
+    Parameters
+    ----------
+    root : the root directory of the repository
+
+    Returns
+    -------
+    A hash of the content of every python file in the source packages
+    """
+
+    digest = hashlib.sha256()
+
+    for package in SOURCE_PACKAGES:
+
+        for name in sorted(os.listdir(os.path.join(root, package))):
+
+            if not name.endswith('.py'):
+                continue
+
+            digest.update(name.encode())
+
+            with open(os.path.join(root, package, name), 'rb') as file:
+                digest.update(file.read())
+
+    return digest.hexdigest()[:16]
+
+
+def get_seed_key(seed):
+    """This function returns a JSON representation of a seed, or None when the seed draws fresh entropy and the
+    results can't be reproduced (and so mustn't be cached)"""
+
+    if seed is None:
+        return None
+
+    if isinstance(seed, np.random.SeedSequence):
+        # The children spawned by spawn_seeds differ only by their spawn key
+        return {'entropy': str(seed.entropy), 'spawn_key': list(seed.spawn_key)}
+
+    return int(seed)
+
+
+def json_default(value):
+    """This function converts the numpy scalars found in results to python numbers for json"""
+
+    if isinstance(value, np.generic):
+        return value.item()
+
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class ResultCache:
+    def __init__(self, directory: str = os.path.join('data', 'cache'), max_bytes: int = 100 * 2 ** 20,
+                 code_version: str = None):
+        """This class stores experiment results as one JSON file per set of parameters. Files are written atomically,
+        so an interrupted sweep leaves only complete results behind, and the least recently used ones are evicted
+        when the cache grows over max_bytes"""
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.code_version = get_code_version() if code_version is None else code_version
+
+    def key(self, parameters: Dict) -> str:
+        """This function hashes the parameters of an experiment together with the code version"""
+
+        parameters = json.dumps(
+            {**parameters, 'code_version': self.code_version}, sort_keys = True, default = json_default)
+
+        return hashlib.sha256(parameters.encode()).hexdigest()
+
+    def path(self, parameters: Dict) -> str:
+        """This function returns the file the result of the experiment is kept in"""
+
+        return os.path.join(self.directory, f"{self.key(parameters)}.json")
+
+    def get(self, parameters: Dict) -> Optional[Dict]:
+        """This function returns the cached result of the experiment, or None when it hasn't been run yet"""
+
+        path = self.path(parameters)
+
+        try:
+            with open(path) as file:
+                result = json.load(file)['result']
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+
+        try:
+            # Mark the entry as recently used for the eviction
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+        return result
+
+    def put(self, parameters: Dict, result: Dict):
+        """This function caches the result of the experiment, then evicts old entries if the cache is too big"""
+
+        os.makedirs(self.directory, exist_ok = True)
+        descriptor, temporary_path = tempfile.mkstemp(dir = self.directory, suffix = '.tmp')
+
+        try:
+            with os.fdopen(descriptor, 'w') as file:
+                json.dump({'parameters': parameters, 'result': result}, file, default = json_default)
+
+            os.replace(temporary_path, self.path(parameters))
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+        self.evict()
+
+    def size(self) -> int:
+        """This function returns the number of bytes taken by the cached results"""
+
+        return sum(size for _, _, size in self._entries())
+
+    def _entries(self):
+        """This function lists the path, last use and size of every cached result"""
+
+        entries = []
+
+        if not os.path.isdir(self.directory):
+            return entries
+
+        for name in os.listdir(self.directory):
+
+            if not name.endswith('.json'):
+                continue
+
+            try:
+                status = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                # Evicted by another process in the meantime
+                continue
+
+            entries.append((os.path.join(self.directory, name), status.st_mtime, status.st_size))
+
+        return entries
+
+    def evict(self):
+        """This function removes the least recently used results until the cache fits in max_bytes"""
+
+        entries = sorted(self._entries(), key = lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+
+        for path, _, size in entries:
+
+            if total <= self.max_bytes:
+                break
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+            total -= size
+
+    def clear(self):
+        """This function removes every cached result"""
+
+        for path, _, _ in self._entries():
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import tempfile
+import uuid
+from typing import Dict, List
+from urllib.parse import quote
+import pandas as pd
+from utils.result_cache import json_default
+
+"""File containing the partitioned Parquet store of sweep summaries and per-customer and per-event traces"""
+
+# Parameters the traces are partitioned by, in the order of the directories
+TRACE_PARTITIONS = ('technique', 'arrival_lambda', 'bus_seats', 'bus_stops')
+TRACES = ('customers', 'events')
+
+
+def _import_pyarrow():
+    """This function imports pyarrow, which is only needed by the results store"""
+
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.fs
+        import pyarrow.parquet
+    except ImportError as error:
+        raise ImportError(
+            "The results store writes Parquet files with pyarrow, which is not installed. "
+            "Install it with `pipenv install pyarrow` or `pip install pyarrow`.") from error
+
+    return pyarrow
+
+
+def get_file_name(parameters: Dict) -> str:
+    """This function names the file of a batch after its parameters, so writing the same batch again replaces it
+    instead of duplicating it"""
+
+    parameters = json.dumps(parameters, sort_keys = True, default = json_default)
+
+    return f"part-{hashlib.sha256(parameters.encode()).hexdigest()[:32]}.parquet"
+
+
+class ResultsStore:
+    def __init__(self, root: str = os.path.join('data', 'results')):
+        """This class keeps tables of results as hive-partitioned Parquet datasets under root (one directory per
+        table, e.g. summaries/technique=Standard MC/part-....parquet). Every batch of rows is written to its own
+        file as soon as it is complete, and tables are read back lazily with pyarrow.dataset"""
+
+        self.root = root
+
+    def partition_path(self, table: str, partition: Dict) -> str:
+        """This function returns the directory of the rows of a table with the given partition values"""
+
+        return os.path.join(
+            self.root, table, *(f"{key}={quote(str(value), safe = ' ')}" for key, value in partition.items()))
+
+    def write(self, table: str, partition: Dict, rows: pd.DataFrame, file_name: str = None) -> str:
+        """
+        This function writes a batch of rows to a table
+        Parameters
+        ----------
+        table : name of the table, e.g. 'summaries', 'customers' or 'events'
+        partition : the partition values of the rows, which are kept in the directory names rather than the file
+        rows : the rows of the batch
+        file_name : name of the file, see get_file_name (a random name by default)
+
+        Returns
+        -------
+        The path of the written file
+        """
+
+        pyarrow = _import_pyarrow()
+
+        directory = self.partition_path(table, partition)
+        os.makedirs(directory, exist_ok = True)
+        path = os.path.join(directory, file_name or f"part-{uuid.uuid4().hex}.parquet")
+
+        rows = pyarrow.Table.from_pandas(
+            pd.DataFrame(rows).drop(columns = list(partition), errors = 'ignore'), preserve_index = False)
+
+        # Write to a hidden file next to the final one then move it, so readers never see half a file
+        descriptor, temporary_path = tempfile.mkstemp(dir = directory, prefix = '.', suffix = '.tmp')
+        os.close(descriptor)
+
+        try:
+            pyarrow.parquet.write_table(rows, temporary_path)
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+        return path
+
+    def write_summaries(self, summaries: List[Dict], file_name: str = None):
+        """This function writes the summaries of run_experiment, partitioned by technique"""
+
+        for technique in dict.fromkeys(summary['technique'] for summary in summaries):
+            self.write(
+                'summaries', {'technique': technique},
+                pd.DataFrame([summary for summary in summaries if summary['technique'] == technique]), file_name)
+
+    def write_trace(self, trace: str, parameters: Dict, replication: int, rows: pd.DataFrame, file_name: str = None):
+        """This function writes the trace ('customers' or 'events') of one replication, partitioned by the technique
+        and the parameters of the system"""
+
+        if trace not in TRACES:
+            raise ValueError(f"Unknown trace {trace!r}, expected one of {TRACES}")
+
+        rows = pd.DataFrame(rows)
+        rows.insert(0, 'replication', replication)
+
+        self.write(trace, {key: parameters[key] for key in TRACE_PARTITIONS}, rows, file_name)
+
+    def dataset(self, table: str):
+        """This function opens a table as a memory-mapped pyarrow dataset, which can be filtered and projected
+        without loading the whole table. Batches with different columns are read with the union of their columns"""
+
+        pyarrow = _import_pyarrow()
+
+        path = os.path.join(self.root, table)
+        filesystem = pyarrow.fs.LocalFileSystem(use_mmap = True)
+        dataset = pyarrow.dataset.dataset(path, format = 'parquet', partitioning = 'hive', filesystem = filesystem)
+        schema = pyarrow.unify_schemas(
+            [dataset.schema] + [fragment.physical_schema for fragment in dataset.get_fragments()])
+
+        return pyarrow.dataset.dataset(
+            path, schema = schema, format = 'parquet', partitioning = 'hive', filesystem = filesystem)
+
+    def read(self, table: str, columns: List[str] = None, filter = None) -> pd.DataFrame:
+        """This function loads the rows of a table that match the filter (a pyarrow.dataset expression, e.g.
+        pyarrow.dataset.field('bus_seats') == 50) as a dataframe"""
+
+        return self.dataset(table).to_table(columns = columns, filter = filter).to_pandas()
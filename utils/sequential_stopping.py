@@ -0,0 +1,116 @@
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+import scipy.stats as stats
+from utils.simulation import simulate_replications, summarise_experiment
+
+"""File containing the sequential stopping rule that adds replications until the estimates are precise enough"""
+
+# Metrics whose precision can be targeted, and the per-replication column each one is estimated from
+PRECISION_METRICS = {
+    'waiting_time': 'average_waiting_time',
+    'serving_time': 'average_serving_time',
+    'customers_upon_arrival': 'average_customers_upon_arrival',
+    'queue_length': 'average_queue_length',
+}
+
+
+def get_confidence_interval_half_width(values, confidence: float = 0.95) -> float:
+    """
+    This function returns the half-width of the Student t confidence interval on the mean of the values
+    Parameters
+    ----------
+    values : the per-replication observations
+    confidence : the confidence level of the interval
+
+    Returns
+    -------
+    The half-width of the confidence interval (infinite with fewer than two observations)
+    """
+
+    values = np.asarray(values, dtype = float)
+
+    if len(values) < 2:
+        return float('inf')
+
+    return stats.t.ppf((1 + confidence) / 2, len(values) - 1) * np.std(values, ddof = 1) / np.sqrt(len(values))
+
+
+def get_relative_half_width(values, confidence: float = 0.95) -> float:
+    """
+    This function returns the half-width of the confidence interval on the mean relative to the mean
+    Parameters
+    ----------
+    values : the per-replication observations
+    confidence : the confidence level of the interval
+
+    Returns
+    -------
+    The relative half-width (0 for a constant zero metric, infinite for a zero mean with some noise)
+    """
+
+    half_width = get_confidence_interval_half_width(values, confidence)
+    mean = abs(np.mean(values))
+
+    if mean == 0:
+        return 0.0 if half_width == 0 else float('inf')
+
+    return half_width / mean
+
+
+def run_experiment_until_precision(
+    arrival_lambda: float, bus_seats: int, bus_stops: int, variance_reduction: str = 'Standard MC',
+    relative_tolerance: float = 0.05, confidence: float = 0.95, metrics: Tuple[str, ...] = ('waiting_time',),
+    batch_size: int = 100, max_iterations: int = 10000, serving_limit: int = 100,
+    time_limit: float = float('inf'), engine: str = 'batch', seed = None, workers: int = 1,
+    chunk_size: int = 1000, **replication_kwargs) -> Dict:
+
+    """This function adds batches of batch_size replications until the confidence interval of every selected metric
+    (keys of PRECISION_METRICS) has a relative half-width below relative_tolerance, or max_iterations replications
+    have been run. Replication i is seeded with the i-th child of SeedSequence(seed), so the estimates are the same as
+    those of run_experiment with the same seed and the number of iterations used.
+
+    The result is the run_experiment summary, with the number of iterations used, whether the target was reached and
+    the achieved half-width and relative half-width of each selected metric"""
+
+    if max_iterations < 1 or batch_size < 1:
+        raise ValueError(f"max_iterations and batch_size must be at least 1, got {max_iterations} and {batch_size}")
+
+    unknown_metrics = set(metrics) - set(PRECISION_METRICS)
+
+    if unknown_metrics:
+        raise ValueError(f"Unknown metrics {sorted(unknown_metrics)}, expected some of {list(PRECISION_METRICS)}")
+
+    root_seed = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    experiment_results: List[Dict] = []
+    converged = False
+
+    while len(experiment_results) < max_iterations:
+
+        # Each spawn continues the sequence of child seeds where the previous batch stopped
+        replication_seeds = root_seed.spawn(min(batch_size, max_iterations - len(experiment_results)))
+        experiment_results += simulate_replications(
+            replication_seeds, workers, chunk_size, arrival_lambda = arrival_lambda, bus_seats = bus_seats,
+            bus_stops = bus_stops, variance_reduction = variance_reduction, serving_limit = serving_limit,
+            time_limit = time_limit, engine = engine, **replication_kwargs)
+
+        results = pd.DataFrame(experiment_results)
+        converged = all(
+            get_relative_half_width(results[PRECISION_METRICS[metric]], confidence) <= relative_tolerance
+            for metric in metrics)
+
+        if converged:
+            break
+
+    summary = summarise_experiment(
+        experiment_results, len(experiment_results), arrival_lambda, bus_seats, bus_stops, variance_reduction)
+    summary['converged'] = converged
+    summary['confidence'] = confidence
+
+    for metric in metrics:
+        summary[f'{metric}_half_width'] = get_confidence_interval_half_width(
+            results[PRECISION_METRICS[metric]], confidence)
+        summary[f'{metric}_relative_half_width'] = get_relative_half_width(
+            results[PRECISION_METRICS[metric]], confidence)
+
+    return summary
@@ -1,7 +1,21 @@
 from helpers.simulation import Simulation
-from typing import List, Dict
+from helpers.profile import SimulationProfile, profile_phase
+from helpers.variate_stream import VariateStream
+from functools import partial
+from itertools import product
+import os
+import time
+from typing import List, Dict, Tuple
 import pandas as pd
 from utils.inverse_transform_sampling import *
+from utils.vectorized_simulation import run_simulation_vectorized, run_simulation_batch
+from utils.parallel import spawn_seeds, chunk, parallel_map
+from utils.analytical import get_analytical_result, is_lightly_loaded
+from utils.result_cache import ResultCache, get_seed_key
+from utils.results_store import ResultsStore, TRACES, get_file_name
+from utils.control_variates import CONTROLS, apply_control_variates, get_control_means
+from utils.distributions import Distribution, CustomerClasses, get_input_distributions, get_distribution_parameters
+from utils.checkpoint import Checkpointer, EVENTS_PER_CHECK
 import numpy as np
 from tqdm import tqdm
 
@@ -45,18 +59,70 @@ def get_statistics_distribution(arrival_lambda: float, bus_seats: int, bus_stops
 def run_simulation(
         bus_seats: int, bus_stops: int, 
         interarrival_times: List[float], serving_times: List[float],
-        serving_limit: int = 100, time_limit: float = float('inf'), verbose: bool = False):
+        serving_limit: int = 100, time_limit: float = float('inf'), verbose: bool = False, event_calendar: str = 'list',
+        streaming: bool = False, trace: bool = False, profile: SimulationProfile = None,
+        arrival_times: List[float] = None, balking_threshold: int = None, patience_times: List[float] = None,
+        checkpoint: Checkpointer = None, checkpoint_parameters: Dict = None, serving_classes: List[int] = None,
+        class_names: List[str] = None):
+
+    """This function goes through one simulation cycle of our system.
+
+    With streaming, the statistics are accumulated online in constant memory instead of from the full customer and
+    step histories; the result then also has the waiting time standard deviation and the time-average queue length.
+    With trace, the result also has the 'customers' and 'events' histories as dataframes (not when streaming).
+    With a profile, the event loop and the aggregation of the results are timed and instrumented in it.
+    arrival_times feeds the absolute arrival times of an arrival process instead of interarrival times (see
+    Simulation). With a balking_threshold or patience_times, customers abandon the queue (see Simulation), and the
+    result also has the numbers of customers who 'balked' and 'reneged' and the 'abandonment_rate' of the arrivals
+
+    With a checkpoint (see utils/checkpoint), the simulation and its step results are saved under
+    checkpoint_parameters at the checkpoint's interval, and a run with a checkpoint under the same parameters resumes
+    from it instead of starting over (its simulation already holds the inputs, so the given ones are then unused)
+
+    serving_classes gives the customer class (index in class_names) of every serving time, e.g. of a CustomerClasses
+    serving distribution. The class of every customer is then recorded (see Simulation), and the result also has the
+    average waiting and serving times of each class, '<class>_average_waiting_time' and '<class>_average_serving_time'
+    (not when streaming)
+    """
+
+    if serving_classes is not None and streaming:
+        raise ValueError("Classes are summarised from the customer history, which isn't kept when streaming")
+
+    if trace and streaming:
+        raise ValueError("Traces need the full histories, which aren't kept when streaming")
 
-    """This function goes through one simulation cycle of our system"""
+    resumed = checkpoint.load(checkpoint_parameters) if checkpoint is not None else None
 
-    # Create a simulation object
-    simulation = Simulation(bus_seats, bus_stops, interarrival_times, serving_times, verbose)
+    if resumed is not None:
+        simulation, step_results, event_times = resumed
+
+        # The given streams take over the state of the checkpointed ones, so that their means cover the whole run
+        if isinstance(interarrival_times, VariateStream):
+            interarrival_times.restore(simulation.interarrival_times)
+            simulation.interarrival_times = interarrival_times
+
+        if isinstance(serving_times, VariateStream):
+            serving_times.restore(simulation.serving_times)
+            simulation.serving_times = serving_times
+    else:
+        # Create a simulation object
+        simulation = Simulation(
+            bus_seats, bus_stops, interarrival_times, serving_times, verbose, event_calendar, streaming,
+            profile = profile, arrival_times = arrival_times, balking_threshold = balking_threshold,
+            patience_times = patience_times, serving_classes = serving_classes)
+        step_results = []
+        event_times = []
 
     # While the number of customers served is fewer than the serving limit for the simulation
-    # and system clock is less than our limit (2 ways of controlling simulation length)
-    step_results = []
+    # and system clock is less than our limit (2 ways of controlling simulation length),
+    # and there are events left (arrivals stop when the inputs run out or the arrival rate stays at 0, and customers
+    # may still renege)
+    events = 0
+    event_loop_start = time.perf_counter()
     
-    while simulation.total_served < serving_limit and simulation.time < time_limit:
+    while (simulation.total_served < serving_limit and simulation.time < time_limit
+           and min(simulation.time_to_next_arrival, simulation.time_to_next_departure, simulation.purge_reneges())
+           < float('inf')):
 
         if verbose:
             print(f"Current time is {simulation.time}.")
@@ -64,23 +130,109 @@ def run_simulation(
         # Time a time step till the next event in the simulation
         simulation.time_step()
         # Find the relevant statistics at that time step
-        stats = simulation.calculate_statistics()
-        step_results.append(stats)
+        stats = simulation.calculate_statistics() if verbose or not streaming else None
+
+        # When streaming, the step statistics are accumulated by the simulation itself
+        if not streaming:
+            step_results.append(stats)
+
+        if trace:
+            event_times.append(simulation.time)
 
         if verbose:
             print(f"Total arrivals: {stats['arrivals']}, total queue length: {stats['queue']}, total served: {stats['served']}.")
 
+        events += 1
+
+        # Only look at the clock every so often, as the event loop is much faster than a checkpoint
+        if checkpoint is not None and events % EVENTS_PER_CHECK == 0:
+            checkpoint.save(checkpoint_parameters, (simulation, step_results, event_times))
+
+    if checkpoint is not None:
+        checkpoint.remove(checkpoint_parameters)
+
     if verbose:
         print("\nSimulation complete.")
         print(f"Total arrivals is {simulation.total_arrivals} with {simulation.total_served} actually served.")
 
-    customer_results, system_results = aggregate_results(simulation.get_customer_history()), aggregate_results(step_results)
+    if profile is not None:
+        profile.add_time('event_loop', time.perf_counter() - event_loop_start)
+        profile.end_run()
+
+    with profile_phase(profile, 'aggregation'):
+        return summarise_simulation(simulation, step_results, event_times, streaming, trace, class_names)
+
+
+def summarise_simulation(
+    simulation: Simulation, step_results: List[Dict], event_times: List[float], streaming: bool = False,
+    trace: bool = False, class_names: List[str] = None) -> Dict:
+
+    """This function computes the results of run_simulation from the simulation and its step results"""
+
+    if streaming:
+        return {**simulation.statistics.calculate_stats(), **get_abandonment_statistics(simulation)}
+
+    customer_results, system_results = pd.DataFrame(simulation.get_customer_history()), aggregate_results(step_results)
     
-    return {
+    results = {
         'average_waiting_time': get_average_waiting_time(customer_results),
         'average_queue_length': get_average_queue_length(system_results),
         'average_serving_time': get_average_serving_time(customer_results),
-        'average_customers_upon_arrival': np.mean(customer_results['customers_upon_arrival'])}
+        'average_customers_upon_arrival': np.mean(customer_results['customers_upon_arrival']),
+        **get_abandonment_statistics(simulation)}
+
+    if 'customer_class' in customer_results:
+        results.update(get_class_statistics(customer_results, class_names))
+
+    if trace:
+        system_results.insert(0, 'time', event_times)
+        results['customers'], results['events'] = customer_results, system_results
+
+    return results
+
+
+def get_abandonment_statistics(simulation: Simulation) -> Dict:
+    """This function returns the numbers of customers who balked and reneged and the fraction of the arrivals who
+    abandoned the queue, when the customers of the simulation can abandon it (nothing otherwise)"""
+
+    if simulation.customers.abandoned is None:
+        return {}
+
+    abandoned = simulation.total_balked + simulation.total_reneged
+
+    return {
+        'balked': simulation.total_balked,
+        'reneged': simulation.total_reneged,
+        'abandonment_rate': abandoned / simulation.total_arrivals if simulation.total_arrivals else np.nan}
+
+
+def get_class_statistics(customer_results: pd.DataFrame, class_names: List[str]) -> Dict:
+    """This function returns the average waiting and serving times of the customers of each class (nan for a class
+    without customers who boarded)"""
+
+    statistics = {}
+
+    for customer_class, name in enumerate(class_names):
+        class_results = customer_results[customer_results['customer_class'] == customer_class]
+        statistics[f'{name}_average_waiting_time'] = get_average_waiting_time(class_results)
+        statistics[f'{name}_average_serving_time'] = get_average_serving_time(class_results)
+
+    return statistics
+
+
+def get_abandonment_parameters(balking_threshold: int = None, patience_distribution: Distribution = None) -> Dict:
+    """This function returns the abandonment parameters that identify an experiment in cache keys, trace file names
+    and checkpoints (none when customers don't abandon the queue, so that those keys don't change)"""
+
+    parameters = {}
+
+    if balking_threshold is not None:
+        parameters['balking_threshold'] = balking_threshold
+
+    if patience_distribution is not None:
+        parameters['patience_distribution'] = patience_distribution.parameters()
+
+    return parameters
 
 
 def aggregate_results(result: List[Dict]):
@@ -100,32 +252,339 @@ def aggregate_results(result: List[Dict]):
 
     return result_df
 
-def run_experiment(
-    iterations: int, arrival_lambda: float, bus_seats: int, bus_stops: int, variance_reduction: str = 'Standard MC',
-    serving_limit: int = 100, time_limit: float = float('inf'), verbose: bool = False):
+def generate_input_uniforms(
+    variance_reduction: str, num_samples, rng: np.random.Generator = None, bins: int = 10):
 
-    experiment_results = []
+    """This function generates the uniform random numbers behind the interarrival and serving times of one replication
+    (or of a (replications, serving_limit) batch) with the given technique. The Latin hypercube is stratified across
+    the replications of the batch, with the interarrival and serving uniforms as independent dimensions"""
+
+    return (
+        generate_technique_uniforms(variance_reduction, num_samples, rng, bins),
+        generate_technique_uniforms(variance_reduction, num_samples, rng, bins))
+
+
+def generate_technique_uniforms(
+    variance_reduction: str, num_samples, rng: np.random.Generator = None, bins: int = 10):
+
+    """This function generates one array of uniform random numbers with the given technique"""
+
+    if variance_reduction == 'Antithetic Variables':
+        return generate_uniform_antithetic(num_samples, rng)
+
+    elif variance_reduction == 'Stratified Sampling':
+        return generate_uniform_stratified(num_samples, bins, rng)
+
+    elif variance_reduction == 'Latin Hypercube':
+        return generate_uniform_latin_hypercube(num_samples, rng)
+
+    # Standard MC and Control Variates
+    return generate_uniform(num_samples, rng)
+
+
+def transform_input_uniforms(
+    variance_reduction: str, interarrival_uniforms, serving_uniforms, arrival_lambda: float, bus_stops: int,
+    interarrival_distribution: Distribution = None, serving_distribution: Distribution = None,
+    rng: np.random.Generator = None):
+
+    """This function maps the uniform random numbers of generate_input_uniforms to interarrival and serving times
+    through the inverse transforms of the given distributions (see utils/distributions, by default exponential
+    interarrival times with rate arrival_lambda and binomial serving times). Arrival processes that aren't inverse
+    transforms, e.g. thinned time-varying Poisson arrivals, are drawn from rng instead, without the technique, and
+    the control variate adjustment only applies to stationary interarrival times"""
+
+    interarrival_distribution, serving_distribution = get_input_distributions(
+        arrival_lambda, bus_stops, interarrival_distribution, serving_distribution)
+    serving_times = serving_distribution.inverse(serving_uniforms)
+
+    if not interarrival_distribution.invertible:
+        return interarrival_distribution.sample(np.shape(interarrival_uniforms), rng), serving_times
+
+    # arrival_lambda = average number of customers in a time period
+    interarrival_times = interarrival_distribution.inverse(interarrival_uniforms)
+
+    if variance_reduction == 'Control Variates' and interarrival_distribution.stationary:
+        interarrival_times = control_variate_adjustment(interarrival_times, interarrival_uniforms)
+
+    return interarrival_times, serving_times
+
+
+def generate_inputs(
+    variance_reduction: str, arrival_lambda: float, bus_stops: int, serving_limit: int,
+    rng: np.random.Generator = None, replications: int = None, interarrival_distribution: Distribution = None,
+    serving_distribution: Distribution = None, serving_classes: bool = False):
+
+    """This function generates the interarrival and serving times of one replication with the given technique, or of
+    a batch of replications as (replications, serving_limit) arrays. With serving_classes, the class of each serving
+    time of a CustomerClasses serving distribution (see CustomerClasses.classify) is also returned"""
+
+    shape = serving_limit if replications is None else (replications, serving_limit)
+    interarrival_uniforms, serving_uniforms = generate_input_uniforms(variance_reduction, shape, rng)
+
+    inputs = transform_input_uniforms(
+        variance_reduction, interarrival_uniforms, serving_uniforms, arrival_lambda, bus_stops,
+        interarrival_distribution, serving_distribution, rng)
+
+    if serving_classes:
+        # The classes come from the same uniforms as the serving times, so the inputs don't change
+        return (*inputs, serving_distribution.classify(serving_uniforms))
+
+    return inputs
+
+
+def generate_input_streams(
+    variance_reduction: str, arrival_lambda: float, bus_stops: int, rng: np.random.Generator = None,
+    block_size: int = 1024, interarrival_distribution: Distribution = None, serving_distribution: Distribution = None):
+
+    """This function returns lazy streams of interarrival and serving times (see VariateStream), drawn in blocks of
+    block_size with the technique applied within each block. The Latin hypercube stratifies across replications,
+    which can't be drawn lazily, and arrival processes would restart from time 0 on every block, so can't be
+    streamed either"""
+
+    if variance_reduction == 'Latin Hypercube':
+        raise ValueError("The Latin hypercube stratifies across replications, so its inputs can't be streamed")
+
+    interarrival_distribution, serving_distribution = get_input_distributions(
+        arrival_lambda, bus_stops, interarrival_distribution, serving_distribution)
+
+    if not interarrival_distribution.stationary:
+        raise ValueError(f"{type(interarrival_distribution).__name__} arrivals can't be streamed")
+
+    # Module level samplers, so that the streams can be pickled in checkpoints
+    interarrival_sampler = partial(sample_interarrival_block, variance_reduction, interarrival_distribution)
+    serving_sampler = partial(sample_serving_block, variance_reduction, serving_distribution)
+
+    return VariateStream(interarrival_sampler, block_size, rng), VariateStream(serving_sampler, block_size, rng)
+
+
+def sample_interarrival_block(
+    variance_reduction: str, interarrival_distribution: Distribution, num_samples: int,
+    rng: np.random.Generator = None) -> np.ndarray:
+
+    """This function draws a block of interarrival times of generate_input_streams with the given technique"""
+
+    interarrival_uniforms = generate_technique_uniforms(variance_reduction, num_samples, rng)
+    interarrival_times = interarrival_distribution.inverse(interarrival_uniforms)
+
+    if variance_reduction == 'Control Variates':
+        interarrival_times = control_variate_adjustment(interarrival_times, interarrival_uniforms)
+
+    return interarrival_times
+
+
+def sample_serving_block(
+    variance_reduction: str, serving_distribution: Distribution, num_samples: int,
+    rng: np.random.Generator = None) -> np.ndarray:
+
+    """This function draws a block of serving times of generate_input_streams with the given technique"""
+
+    return serving_distribution.inverse(generate_technique_uniforms(variance_reduction, num_samples, rng))
+
+
+def generate_chunk_inputs(
+    replication_seeds: List[np.random.SeedSequence], variance_reduction: str, arrival_lambda: float, bus_stops: int,
+    serving_limit: int, interarrival_distribution: Distribution = None, serving_distribution: Distribution = None,
+    serving_classes: bool = False):
+
+    """This function generates the interarrival and serving times (and serving classes, see generate_inputs) of a
+    chunk of replications as (replications, serving_limit) arrays. Each replication is drawn from its own seed so
+    that it doesn't depend on the chunking, except for the Latin hypercube, which stratifies across the replications
+    of the chunk and is drawn as a whole from the first seed of the chunk"""
+
+    replications = len(replication_seeds)
+    distributions = {
+        'interarrival_distribution': interarrival_distribution, 'serving_distribution': serving_distribution,
+        'serving_classes': serving_classes}
+
+    if variance_reduction == 'Latin Hypercube':
+        rng = None if replication_seeds[0] is None else np.random.default_rng(replication_seeds[0])
+
+        return generate_inputs(
+            variance_reduction, arrival_lambda, bus_stops, serving_limit, rng, replications, **distributions)
+
+    if all(replication_seed is None for replication_seed in replication_seeds):
+        # Draw the inputs of every replication in one go
+        return generate_inputs(
+            variance_reduction, arrival_lambda, bus_stops, serving_limit, replications = replications,
+            **distributions)
 
-    for _ in range(iterations):
+    inputs = [
+        generate_inputs(
+            variance_reduction, arrival_lambda, bus_stops, serving_limit, np.random.default_rng(replication_seed),
+            **distributions)
+        for replication_seed in replication_seeds]
 
-        # arrival_lambda = average number of customers in a time period
-        if variance_reduction == 'Antithetic Variables':
-            interarrival_times = generate_exponential_antithetic(arrival_lambda, num_samples=serving_limit)
-            serving_times = [x+1 for x in generate_binomial_antithetic(n=bus_stops, num_samples=serving_limit)]
+    return tuple(np.stack(replication_inputs) for replication_inputs in zip(*inputs))
 
-        elif variance_reduction == 'Stratified Sampling':
-            interarrival_times = generate_exponential_stratified(arrival_lambda, serving_limit, 10)
-            serving_times = [x+1 for x in generate_binomial_stratified(n=bus_stops, num_samples=serving_limit, bins=10)]
 
-        elif variance_reduction == 'Control Variates':
-            interarrival_times = generate_exponential_control_variate(arrival_lambda, serving_limit)
-            serving_times = [generate_binomial(n=bus_stops)+1 for _ in range(serving_limit)]
+def run_replications(
+    replication_seeds: List[np.random.SeedSequence], arrival_lambda: float, bus_seats: int, bus_stops: int,
+    variance_reduction: str = 'Standard MC', serving_limit: int = 100, time_limit: float = float('inf'),
+    verbose: bool = False, event_calendar: str = 'list', engine: str = 'object', streaming: bool = False,
+    store: ResultsStore = None, traces: Tuple[str] = (), profile: bool = False,
+    interarrival_distribution: Distribution = None, serving_distribution: Distribution = None,
+    balking_threshold: int = None, patience_distribution: Distribution = None,
+    checkpoint: Checkpointer = None) -> List[Dict]:
+
+    """This function simulates one replication per seed (a None seed uses the default random number generator) and
+    returns the per-replication results. The batch engine simulates all of the given replications at once. The
+    interarrival and serving times are drawn from the given distributions (see generate_inputs).
+
+    Every result also has the sample means of the replication's interarrival and serving times, the controls of
+    the output-level control variates (see summarise_experiment).
+
+    With an infinite serving_limit, the object engine draws the inputs lazily from streams (see
+    generate_input_streams), so the run is only bounded by time_limit; the controls are then the means of the drawn
+    blocks.
+
+    The object engine can write the traces of each replication ('customers' and/or 'events') to the store as soon as
+    it is simulated. Traces need SeedSequence seeds, whose last spawn key is the number of the replication.
+
+    With profile, the first result also has the SimulationProfile of the whole chunk under 'profile' (the event
+    counts, queue high-water mark and seat utilisation are only instrumented by the object engine)
+
+    Time-varying arrival processes (see utils/distributions.ArrivalProcess) are fed to the engines as absolute arrival
+    times, so that arrivals follow the rate of the time of day exactly. A whole day is then simulated in one run with
+    time_limit as the end of the day and a serving_limit above the number of arrivals the day can have
+
+    With a balking_threshold or a patience_distribution, customers abandon the queue (see Simulation, object engine
+    only) and every result also has the abandonment_rate. The patience time of every arrival is drawn after the other
+    inputs, so the interarrival and serving times of a seed are the same with and without abandonment
+
+    With a CustomerClasses serving distribution, the object engine without streaming records the class of every
+    customer (see Simulation), and every result also has the average waiting and serving times of each class
+    ('<class>_average_waiting_time' and '<class>_average_serving_time')
+
+    With a checkpoint, the object engine checkpoints the replications bounded by time alone (without a serving limit)
+    that have a SeedSequence seed while they run (see run_simulation), so a long replication resumes where it
+    stopped. Other replications are short, and profiled ones aren't checkpointed"""
+
+    experiment_results = []
+    chunk_profile = SimulationProfile() if profile else None
+    distributions = {
+        'interarrival_distribution': interarrival_distribution, 'serving_distribution': serving_distribution}
+    arrival_process = interarrival_distribution is not None and not interarrival_distribution.stationary
+    # Classes are recorded in the customer history of the object engine, which streamed inputs don't have
+    classified = (
+        isinstance(serving_distribution, CustomerClasses) and engine == 'object' and not streaming
+        and serving_limit != float('inf'))
+    serving_classes = None
+
+    if engine == 'batch':
+
+        with profile_phase(chunk_profile, 'sampling'):
+            interarrival_times, serving_times = generate_chunk_inputs(
+                replication_seeds, variance_reduction, arrival_lambda, bus_stops, serving_limit, **distributions)
+
+        with profile_phase(chunk_profile, 'event_loop'):
+            batch_results = run_simulation_batch(
+                bus_seats, bus_stops, interarrival_times, serving_times, serving_limit, time_limit,
+                len(replication_seeds),
+                arrival_times = np.cumsum(interarrival_times, axis = 1) if arrival_process else None)
+
+        average_interarrival_times = interarrival_times.mean(axis = 1)
+        average_serving_times = serving_times.mean(axis = 1)
+
+        for replication in range(len(replication_seeds)):
+            experiment_results.append({
+                'arrival_lambda': arrival_lambda,
+                'bus_seats': bus_seats,
+                'bus_stops': bus_stops,
+                **{key: value[replication] for key, value in batch_results.items()},
+                'average_interarrival_time': average_interarrival_times[replication],
+                'average_input_serving_time': average_serving_times[replication],
+            })
+
+        if profile:
+            chunk_profile.runs += len(replication_seeds)
+            experiment_results[0]['profile'] = chunk_profile
+
+        return experiment_results
+
+    if variance_reduction == 'Latin Hypercube':
+
+        with profile_phase(chunk_profile, 'sampling'):
+            chunk_inputs = generate_chunk_inputs(
+                replication_seeds, variance_reduction, arrival_lambda, bus_stops, serving_limit, **distributions,
+                serving_classes = classified)
+
+    for replication, replication_seed in enumerate(replication_seeds):
+
+        rng = None if replication_seed is None else np.random.default_rng(replication_seed)
+
+        # Streams draw their blocks during the event loop, which then includes their sampling time
+        with profile_phase(chunk_profile, 'sampling'):
+
+            if variance_reduction == 'Latin Hypercube':
+                interarrival_times, serving_times = chunk_inputs[0][replication], chunk_inputs[1][replication]
+            elif serving_limit == float('inf'):
+                interarrival_times, serving_times = generate_input_streams(
+                    variance_reduction, arrival_lambda, bus_stops, rng, **distributions)
+            else:
+                replication_inputs = generate_inputs(
+                    variance_reduction, arrival_lambda, bus_stops, serving_limit, rng, **distributions,
+                    serving_classes = classified)
+                interarrival_times, serving_times = replication_inputs[:2]
+
+            if classified:
+                serving_classes = (
+                    chunk_inputs[2][replication] if variance_reduction == 'Latin Hypercube'
+                    else replication_inputs[2]).tolist()
+
+        arrival_times = np.cumsum(interarrival_times) if arrival_process else None
+        # Only replications bounded by time alone can run long enough to be worth a checkpoint, and replications are
+        # told apart by their seeds
+        replication_checkpoint = (
+            checkpoint if serving_limit == float('inf') and isinstance(replication_seed, np.random.SeedSequence)
+            and not profile else None)
+        parameters = checkpoint_parameters = None
+
+        if traces or replication_checkpoint is not None:
+            parameters = {
+                'technique': variance_reduction, 'arrival_lambda': arrival_lambda, 'bus_seats': bus_seats,
+                'bus_stops': bus_stops, 'serving_limit': serving_limit, 'time_limit': time_limit,
+                'seed': get_seed_key(replication_seed), **get_distribution_parameters(**distributions),
+                **get_abandonment_parameters(balking_threshold, patience_distribution)}
+            checkpoint_parameters = {**parameters, 'streaming': streaming}
+
+        if patience_distribution is None:
+            patience_times = None
+        elif serving_limit == float('inf'):
+            patience_times = VariateStream(patience_distribution.sample, rng = rng)
+        else:
+            patience_times = patience_distribution.sample(len(interarrival_times), rng).tolist()
+
+        if engine == 'vectorized':
+
+            with profile_phase(chunk_profile, 'event_loop'):
+                customer_history = run_simulation_vectorized(
+                    bus_seats, bus_stops, interarrival_times, serving_times, serving_limit, time_limit, verbose,
+                    arrival_times)
+
+            if profile:
+                chunk_profile.runs += 1
+        elif serving_limit == float('inf'):
+            customer_history = run_simulation(
+                bus_seats, bus_stops, interarrival_times, serving_times, serving_limit, time_limit, verbose,
+                event_calendar, streaming, trace = bool(traces), profile = chunk_profile,
+                balking_threshold = balking_threshold, patience_times = patience_times,
+                checkpoint = replication_checkpoint, checkpoint_parameters = checkpoint_parameters)
+        else:
+            # Plain floats are much faster than numpy scalars in the event loop
+            customer_history = run_simulation(
+                bus_seats, bus_stops, interarrival_times.tolist(), serving_times.tolist(), serving_limit, time_limit,
+                verbose, event_calendar, streaming, trace = bool(traces), profile = chunk_profile,
+                arrival_times = None if arrival_times is None else arrival_times.tolist(),
+                balking_threshold = balking_threshold, patience_times = patience_times,
+                serving_classes = serving_classes, class_names = serving_distribution.names if classified else None)
+
+        if traces:
+
+            for name in traces:
+                # Rerunning the same replication replaces its trace
+                store.write_trace(
+                    name, parameters, replication_seed.spawn_key[-1], customer_history[name], get_file_name(parameters))
 
-        else: # Standard MC
-            interarrival_times = [generate_exponential(arrival_lambda) for _ in range(serving_limit)]
-            serving_times = [generate_binomial(n=bus_stops)+1 for _ in range(serving_limit)]
-        
-        customer_history = run_simulation(bus_seats, bus_stops, interarrival_times, serving_times, serving_limit, time_limit, verbose)
         experiment_results.append({
             'arrival_lambda': arrival_lambda,
             'bus_seats': bus_seats,
@@ -134,11 +593,127 @@ def run_experiment(
             'average_serving_time': customer_history['average_serving_time'],
             'average_queue_length': customer_history['average_queue_length'],
             'average_customers_upon_arrival': customer_history['average_customers_upon_arrival'],
+            'average_interarrival_time': interarrival_times.mean(),
+            'average_input_serving_time': serving_times.mean(),
         })
 
+        if 'abandonment_rate' in customer_history:
+            experiment_results[-1]['abandonment_rate'] = customer_history['abandonment_rate']
+
+        if classified:
+            experiment_results[-1].update({
+                f'{name}_average_{output}': customer_history[f'{name}_average_{output}']
+                for name in serving_distribution.names for output in ('waiting_time', 'serving_time')})
+
+    if profile:
+        experiment_results[0]['profile'] = chunk_profile
+
+    return experiment_results
+
+
+def simulate_replications(
+    replication_seeds: List[np.random.SeedSequence], workers: int = 1, chunk_size: int = 1000,
+    **replication_kwargs) -> List[Dict]:
+
+    """This function runs run_replications on chunks of chunk_size seeds on a pool of workers processes and returns
+    the per-replication results in the order of the seeds"""
+
+    engine = replication_kwargs.get('engine', 'object')
+
+    if engine not in ('object', 'vectorized', 'batch'):
+        raise ValueError(f"Unknown engine {engine!r}, expected 'object', 'vectorized' or 'batch'")
+
+    if replication_kwargs.get('serving_limit') == float('inf'):
+
+        if engine != 'object' or replication_kwargs.get('time_limit', float('inf')) == float('inf'):
+            raise ValueError("Runs without a serving limit need the object engine and a finite time limit")
+
+        if replication_kwargs.get('variance_reduction') == 'Latin Hypercube':
+            raise ValueError("The Latin hypercube stratifies across replications, so its inputs can't be streamed")
+
+    if replication_kwargs.get('balking_threshold') is not None or replication_kwargs.get('patience_distribution'):
+
+        if engine != 'object':
+            raise ValueError("Customers only abandon the queue with the object engine")
+
+        # The design is drawn from the seed of the chunk's first replication, whose patience times would reuse it
+        if (replication_kwargs.get('patience_distribution')
+                and replication_kwargs.get('variance_reduction') == 'Latin Hypercube'):
+            raise ValueError("Patience times can't be drawn alongside the Latin hypercube")
+
+    traces = replication_kwargs.get('traces', ())
+
+    if traces:
+
+        if not set(traces) <= set(TRACES):
+            raise ValueError(f"Unknown traces {traces!r}, expected some of {TRACES}")
+
+        if engine != 'object' or replication_kwargs.get('streaming') or replication_kwargs.get('store') is None:
+            raise ValueError("Traces are only kept by the object engine without streaming, and need a store")
+
+        if any(not isinstance(replication_seed, np.random.SeedSequence) for replication_seed in replication_seeds):
+            raise ValueError("Traces need SeedSequence seeds to number the replications")
+
+    replicate = partial(run_replications, **replication_kwargs)
+
+    return [
+        replication_result
+        for chunk_results in parallel_map(replicate, chunk(replication_seeds, chunk_size), workers)
+        for replication_result in chunk_results]
+
+
+def simulate_checkpointed_replications(
+    replication_seeds: List[np.random.SeedSequence], checkpoint: Checkpointer, checkpoint_parameters: Dict,
+    workers: int = 1, chunk_size: int = 1000, **replication_kwargs) -> List[Dict]:
+
+    """This function runs simulate_replications in rounds of one chunk per worker, and checkpoints the seeds and the
+    results of the replications done so far under checkpoint_parameters after a round whenever the checkpoint is due.
+    An experiment with a checkpoint under the same parameters resumes after its last checkpointed round, with the
+    seeds of the checkpoint (fresh entropy would otherwise draw new ones) and the default random number generator
+    restored, so its results are the same as an uninterrupted run's"""
+
+    state = checkpoint.load(checkpoint_parameters)
+    replication_seeds, experiment_results = (replication_seeds, []) if state is None else state
+    # Rounds are whole chunks, so the chunks (and Latin hypercube designs) are the same however often it resumes
+    round_size = chunk_size * (os.cpu_count() if workers is None else workers)
+
+    for start in range(len(experiment_results), len(replication_seeds), round_size):
+        experiment_results += simulate_replications(
+            replication_seeds[start:start + round_size], workers, chunk_size, checkpoint = checkpoint,
+            **replication_kwargs)
+        checkpoint.save(checkpoint_parameters, (replication_seeds, experiment_results))
+
+    checkpoint.remove(checkpoint_parameters)
+
+    return experiment_results
+
+
+def summarise_experiment(
+    experiment_results: List[Dict], iterations: int, arrival_lambda: float, bus_seats: int, bus_stops: int,
+    variance_reduction: str = 'Standard MC', output_control_variates: bool = False,
+    interarrival_distribution: Distribution = None, serving_distribution: Distribution = None):
+
+    """This function summarises the per-replication results of an experiment.
+
+    With output_control_variates, the replication outputs are first adjusted with the sample means of their inputs as
+    controls (see utils/control_variates), and the summary also has the variance reduction ratio of each output with
+    respect to the unadjusted replications. The expectations of the controls are the means of the input
+    distributions"""
+
     results = pd.DataFrame(experiment_results)
-    
-    return {
+    outputs = ['average_waiting_time', 'average_serving_time', 'average_customers_upon_arrival']
+    variance_reduction_ratios = {}
+
+    if output_control_variates:
+        control_variates = apply_control_variates(
+            results[outputs].to_numpy(), results[list(CONTROLS)].to_numpy(),
+            get_control_means(arrival_lambda, bus_stops, interarrival_distribution, serving_distribution))
+        results[outputs] = control_variates['outputs']
+        variance_reduction_ratios = {
+            f"{output.replace('average_', '')}_variance_reduction_ratio": ratio
+            for output, ratio in zip(outputs, control_variates['variance_reduction_ratio'])}
+
+    summary = {
         'technique': variance_reduction,
         'iterations': iterations,
         'arrival_lambda': arrival_lambda,
@@ -150,8 +725,197 @@ def run_experiment(
         'serving_time_std': np.std(results['average_serving_time']),
         'customers_upon_arrival_mean': np.mean(results['average_customers_upon_arrival']),
         'customers_upon_arrival_std': np.std(results['average_customers_upon_arrival']),
+        **variance_reduction_ratios,
     }
 
+    if 'abandonment_rate' in results:
+        summary['abandonment_rate_mean'] = np.mean(results['abandonment_rate'])
+        summary['abandonment_rate_std'] = np.std(results['abandonment_rate'])
+
+    if isinstance(serving_distribution, CustomerClasses):
+
+        for name in serving_distribution.names:
+
+            for output in ('waiting_time', 'serving_time'):
+
+                # Classes are only recorded by the object engine without streaming
+                if f'{name}_average_{output}' in results:
+                    summary[f'{name}_{output}_mean'] = np.mean(results[f'{name}_average_{output}'])
+                    summary[f'{name}_{output}_std'] = np.std(results[f'{name}_average_{output}'])
+
+    return summary
+
+
+def run_experiment(
+    iterations: int, arrival_lambda: float, bus_seats: int, bus_stops: int, variance_reduction: str = 'Standard MC',
+    serving_limit: int = 100, time_limit: float = float('inf'), verbose: bool = False, event_calendar: str = 'list',
+    engine: str = 'object', chunk_size: int = 1000, seed = None, workers: int = 1, streaming: bool = False,
+    analytical: str = 'never', analytical_threshold: float = 1e-3, approximation: str = 'mgc',
+    cache: ResultCache = None, store: ResultsStore = None, traces: Tuple[str] = (),
+    output_control_variates: bool = False, profile: bool = False, interarrival_distribution: Distribution = None,
+    serving_distribution: Distribution = None, balking_threshold: int = None,
+    patience_distribution: Distribution = None, checkpoint: Checkpointer = None):
+
+    """This function runs the simulation for the given number of iterations and summarises the results.
+
+    engine chooses how each replication is simulated: 'object' steps through Simulation event by event,
+    'vectorized' computes the same statistics over arrays with run_simulation_vectorized and 'batch' simulates
+    chunk_size replications at once with run_simulation_batch.
+
+    Replications are run in chunks of chunk_size on a pool of workers processes (None for every CPU). When a seed is
+    given, replication i is always seeded with the i-th child of SeedSequence(seed), so results are reproducible
+    whatever the number of workers (and chunk size, except for the 'Latin Hypercube' technique, whose designs are
+    chunks of chunk_size replications). streaming makes the object engine accumulate its statistics online.
+    output_control_variates adjusts the replication outputs with the sample means of their inputs, whose expectations
+    are known, as control variates (on top of any technique, see summarise_experiment).
+
+    interarrival_distribution and serving_distribution replace the exponential interarrival and binomial serving
+    times of our model with distributions of utils/distributions (e.g. Erlang, empirical boarding times, customer
+    classes or time-varying Poisson arrivals), which arrival_lambda and bus_stops then no longer parametrise.
+
+    analytical chooses when the queueing theory approximation of utils/analytical replaces the simulation: 'never',
+    'always', or 'auto' when the Erlang C probability of waiting is below analytical_threshold, i.e. when customers
+    practically never queue. The analytical summary has 0 iterations and a 'method' key. It only exists for the
+    default distributions, so 'auto' always simulates other distributions.
+
+    balking_threshold and patience_distribution let customers abandon the queue (see Simulation): an arrival who finds
+    the bus full and at least balking_threshold customers in the system balks, and a queueing customer whose patience
+    time runs out reneges. The summary then also has the mean and standard deviation of the abandonment rate. There is
+    no analytical approximation with abandonment either.
+
+    With a cache (see utils/result_cache), the summary of a seeded experiment is loaded from disk when the same
+    parameters were already run with the same code, and saved there otherwise. Unseeded experiments aren't cached.
+
+    With a store (see utils/results_store), the summary is written to its 'summaries' table once computed, and the
+    object engine also writes the given traces ('customers' and/or 'events') of every replication. Summaries loaded
+    from the cache aren't written again, and experiments with traces are always simulated.
+
+    With profile, the summary also has the SimulationProfile of every replication combined under 'profile' (with
+    the time spent summarising them as aggregation); profiled experiments are always simulated
+
+    With a checkpoint (see utils/checkpoint), the progress of the experiment is saved at the checkpoint's interval
+    (see simulate_checkpointed_replications), along with the state of object engine replications bounded by time
+    alone (see run_replications), so an interrupted experiment resumes exactly where it stopped when rerun with the same
+    parameters and code
+    """
+
+    if analytical not in ('never', 'auto', 'always'):
+        raise ValueError(f"Unknown analytical mode {analytical!r}, expected 'never', 'auto' or 'always'")
+
+    distribution_parameters = get_distribution_parameters(interarrival_distribution, serving_distribution)
+    abandonment_parameters = get_abandonment_parameters(balking_threshold, patience_distribution)
+
+    if analytical == 'always' and (distribution_parameters or abandonment_parameters):
+        raise ValueError("The analytical approximation only exists for the default input distributions")
+
+    if analytical == 'always' or (
+            analytical == 'auto' and not distribution_parameters and not abandonment_parameters
+            and is_lightly_loaded(arrival_lambda, bus_seats, bus_stops, analytical_threshold)):
+        summary = get_analytical_result(arrival_lambda, bus_seats, bus_stops, variance_reduction, approximation)
+
+        if store is not None:
+            store.write_summaries([summary], get_file_name({'analytical': approximation, **summary}))
+
+        return summary
+
+    # The number of workers and event calendar don't change seeded results, so aren't part of the key
+    cache_parameters = {
+        'arrival_lambda': arrival_lambda, 'bus_seats': bus_seats, 'bus_stops': bus_stops,
+        'variance_reduction': variance_reduction, 'iterations': iterations, 'serving_limit': serving_limit,
+        'time_limit': time_limit, 'seed': get_seed_key(seed), 'engine': engine, 'streaming': streaming,
+        'output_control_variates': output_control_variates, **distribution_parameters, **abandonment_parameters}
+
+    # Neither does the chunk size, except for the Latin hypercube whose designs are drawn per chunk
+    if variance_reduction == 'Latin Hypercube':
+        cache_parameters['chunk_size'] = chunk_size
+    # Traces and profiles are only recorded while simulating, and distributions that can't be described have no key
+    use_cache = (
+        cache is not None and seed is not None and not traces and not profile
+        and None not in distribution_parameters.values() and None not in abandonment_parameters.values())
+
+    if use_cache:
+        cached_summary = cache.get(cache_parameters)
+
+        if cached_summary is not None:
+            return cached_summary
+
+    if seed is None and workers == 1 and not traces:
+        # Keep using the default random number generator
+        replication_seeds = [None] * iterations
+    else:
+        # Forked workers would otherwise share the same random state, and traces are numbered by their seeds
+        replication_seeds = spawn_seeds(seed, iterations)
+
+    replication_kwargs = {
+        'arrival_lambda': arrival_lambda, 'bus_seats': bus_seats, 'bus_stops': bus_stops,
+        'variance_reduction': variance_reduction, 'serving_limit': serving_limit, 'time_limit': time_limit,
+        'verbose': verbose, 'event_calendar': event_calendar, 'engine': engine, 'streaming': streaming,
+        'store': store, 'traces': traces, 'profile': profile, 'interarrival_distribution': interarrival_distribution,
+        'serving_distribution': serving_distribution, 'balking_threshold': balking_threshold,
+        'patience_distribution': patience_distribution}
+
+    if checkpoint is None:
+        experiment_results = simulate_replications(replication_seeds, workers, chunk_size, **replication_kwargs)
+    else:
+        experiment_results = simulate_checkpointed_replications(
+            replication_seeds, checkpoint, cache_parameters, workers, chunk_size, **replication_kwargs)
+
+    summarise_start = time.perf_counter()
+    summary = summarise_experiment(
+        experiment_results, iterations, arrival_lambda, bus_seats, bus_stops, variance_reduction,
+        output_control_variates, interarrival_distribution, serving_distribution)
+    summarise_seconds = time.perf_counter() - summarise_start
+
+    if use_cache:
+        cache.put(cache_parameters, summary)
+
+    if store is not None:
+        # Rerunning a seeded experiment replaces its summary
+        store.write_summaries([summary], get_file_name(cache_parameters) if seed is not None else None)
+
+    if profile:
+        summary['profile'] = SimulationProfile.aggregate(
+            [result['profile'] for result in experiment_results if 'profile' in result])
+        summary['profile'].add_time('aggregation', summarise_seconds)
+
+    return summary
+
+
+def get_sweep_grid(
+    arrival_lambdas: List[float], bus_seats: List[int], bus_stops: List[int], techniques: List[str]) -> List[Dict]:
+
+    """This function lists every combination of the sweep parameters, in the order of main.py's nested loops"""
+
+    return [
+        {'arrival_lambda': arrival_lambda, 'bus_seats': seats, 'bus_stops': stops, 'variance_reduction': technique}
+        for arrival_lambda, seats, stops, technique in product(arrival_lambdas, bus_seats, bus_stops, techniques)]
+
+
+def _run_grid_point(task) -> Dict:
+    """This function runs the experiment of one grid point of a sweep in a worker"""
+
+    grid_point, grid_seed, experiment_kwargs = task
+
+    return run_experiment(**grid_point, **experiment_kwargs, seed = grid_seed)
+
+
+def run_sweep(
+    grid: List[Dict], iterations: int, serving_limit: int = 100, time_limit: float = float('inf'), seed = None,
+    workers: int = 1, chunk_size: int = 1, **experiment_kwargs) -> List[Dict]:
+
+    """This function runs run_experiment for every grid point (see get_sweep_grid) on a pool of workers processes,
+    sending chunk_size grid points to a worker at a time. Grid point i is seeded with the i-th child of
+    SeedSequence(seed), so the results are reproducible whatever the number of workers. Results are in grid order.
+    Passing a cache (see run_experiment) saves each grid point as soon as it is done, so an interrupted sweep resumes
+    where it stopped when rerun with the same seed, and a checkpoint also resumes the grid points that were running"""
+
+    experiment_kwargs = {
+        'iterations': iterations, 'serving_limit': serving_limit, 'time_limit': time_limit, **experiment_kwargs}
+    tasks = [
+        (grid_point, grid_seed, experiment_kwargs) for grid_point, grid_seed in zip(grid, spawn_seeds(seed, len(grid)))]
+
+    return parallel_map(_run_grid_point, tasks, workers, chunk_size)
+
 
 def get_average_waiting_time(customer_results: pd.DataFrame) -> float:
     """
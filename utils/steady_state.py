@@ -0,0 +1,115 @@
+from typing import Dict
+import numpy as np
+import scipy.stats as stats
+from helpers.simulation import Simulation
+from utils.simulation import generate_inputs
+
+"""File containing the steady-state analysis of a single long run: MSER warm-up truncation and batch means"""
+
+
+def mser_truncation(series) -> int:
+    """
+    This function finds the warm-up period of a series with the MSER rule, which truncates the first d observations
+    that minimise the squared standard error of the mean of the rest (d is searched over the first half of the series)
+    Parameters
+    ----------
+    series : the output series, e.g. the batch means kept by StreamingStatistics (MSER-m for batches of m)
+
+    Returns
+    -------
+    The number of observations at the start of the series to discard
+    """
+
+    series = np.asarray(series, dtype = float)
+    observations = len(series)
+
+    if observations < 4:
+        return 0
+
+    # Sums and sums of squares of the observations left after truncating d = 0, 1, ..., n - 1 of them
+    remaining_sum = np.cumsum(series[::-1])[::-1]
+    remaining_sum_squares = np.cumsum((series ** 2)[::-1])[::-1]
+    remaining = observations - np.arange(observations)
+
+    candidates = slice(0, observations // 2 + 1)
+    mser = (
+        (remaining_sum_squares[candidates] - remaining_sum[candidates] ** 2 / remaining[candidates])
+        / remaining[candidates] ** 2)
+
+    return int(np.argmin(mser))
+
+
+def batch_means_interval(series, num_batches: int = 20, confidence: float = 0.95) -> Dict:
+    """
+    This function computes a confidence interval on the steady-state mean of a (truncated) series with batch means
+    Parameters
+    ----------
+    series : the output series after warm-up truncation
+    num_batches : number of batches the series is regrouped into (the oldest observations that don't fill a batch
+                  are dropped)
+    confidence : the confidence level of the interval
+
+    Returns
+    -------
+    The mean, the half-width of the confidence interval and the number of batches used
+    """
+
+    series = np.asarray(series, dtype = float)
+    num_batches = min(num_batches, len(series))
+
+    if num_batches < 2:
+        mean = series.mean() if len(series) else float('nan')
+        return {'mean': mean, 'half_width': float('inf'), 'batches': num_batches}
+
+    batch_length = len(series) // num_batches
+    batch_means = series[len(series) - batch_length * num_batches:].reshape(num_batches, batch_length).mean(axis = 1)
+
+    return {
+        'mean': batch_means.mean(),
+        'half_width':
+            stats.t.ppf((1 + confidence) / 2, num_batches - 1) * batch_means.std(ddof = 1) / np.sqrt(num_batches),
+        'batches': num_batches,
+    }
+
+
+def run_steady_state(
+    arrival_lambda: float, bus_seats: int, bus_stops: int, serving_limit: int = 100000, batch_size: int = 5,
+    num_batches: int = 20, confidence: float = 0.95, event_calendar: str = 'heap', seed = None) -> Dict:
+
+    """This function estimates the steady-state average waiting time and queue length from a single long run of
+    serving_limit customers. The streaming statistics keep the means of batches of batch_size observations, the
+    warm-up is removed from each series with MSER, and the rest is analysed with num_batches batch means.
+
+    Only stable systems (arrival_lambda * mean serving time < bus_seats) have a steady state; for overloaded ones the
+    estimates keep growing with the length of the run"""
+
+    interarrival_times, serving_times = generate_inputs(
+        'Standard MC', arrival_lambda, bus_stops, serving_limit, np.random.default_rng(seed))
+    simulation = Simulation(
+        bus_seats, bus_stops, interarrival_times.tolist(), serving_times.tolist(), event_calendar = event_calendar,
+        streaming = True, batch_size = batch_size)
+
+    while simulation.total_served < serving_limit and simulation.time < float('inf'):
+        simulation.time_step()
+
+    results = {
+        'arrival_lambda': arrival_lambda,
+        'bus_seats': bus_seats,
+        'bus_stops': bus_stops,
+        'customers': simulation.total_served,
+        'confidence': confidence,
+    }
+
+    for metric, batches in (
+            ('waiting_time', simulation.statistics.waiting_time_batches),
+            ('queue_length', simulation.statistics.queue_length_batches)):
+
+        truncated = mser_truncation(batches.means)
+        interval = batch_means_interval(batches.means[truncated:], num_batches, confidence)
+
+        results[f'average_{metric}'] = interval['mean']
+        results[f'{metric}_half_width'] = interval['half_width']
+        # Number of observations discarded as warm-up
+        results[f'{metric}_warm_up'] = truncated * batch_size
+
+    return results
@@ -0,0 +1,268 @@
+import heapq
+from typing import List
+import numpy as np
+
+"""File containing the array engine for our simulation.
+
+The bus is a FIFO multi-server queue, so each customer boards at max(arrival time, earliest time a seat frees up)
+(the Kiefer-Wolfowitz recursion). This lets us compute every boarding and departure time over arrays without stepping
+through events, and then recover the same statistics as run_simulation from those arrays.
+"""
+
+
+def get_arrival_times(interarrival_times) -> np.ndarray:
+    """
+    This function returns the arrival times that Simulation produces from the given interarrival times
+    Parameters
+    ----------
+    interarrival_times : array of shape (n,) or (R, n) with the interarrival times of each run
+
+    Returns
+    -------
+    The arrival times of the n customers of each run (the first gap is used for both the first and second arrival,
+    exactly as Simulation.generate_next_arrival does)
+    """
+
+    interarrival_times = np.asarray(interarrival_times, dtype = float)
+    gaps = np.concatenate([interarrival_times[..., :1], interarrival_times[..., :-1]], axis = -1)
+
+    return np.cumsum(gaps, axis = -1)
+
+
+def fifo_recursion(arrival_times: np.ndarray, serving_times: np.ndarray, bus_seats: int):
+    """
+    This function computes the boarding and departure times of every customer in a FIFO queue with bus_seats servers
+    Parameters
+    ----------
+    arrival_times : sorted arrival times of the customers
+    serving_times : the serving time of each customer, in order of arrival
+    bus_seats : number of seats on the bus (servers)
+
+    Returns
+    -------
+    The boarding times and the departure times of the customers
+    """
+
+    boarded_times = np.empty(len(arrival_times))
+    # Times at which each seat next becomes free, as a min-heap
+    seat_free_times = [0.0] * bus_seats
+
+    for customer, (arrival_time, serving_time) in enumerate(zip(arrival_times.tolist(), serving_times.tolist())):
+        # The customer boards on arrival if a seat is free, otherwise when the earliest seat frees up
+        earliest_free_time = seat_free_times[0]
+        boarded_time = arrival_time if arrival_time >= earliest_free_time else earliest_free_time
+        heapq.heapreplace(seat_free_times, boarded_time + serving_time)
+        boarded_times[customer] = boarded_time
+
+    return boarded_times, boarded_times + serving_times
+
+
+def fifo_recursion_batch(arrival_times: np.ndarray, serving_times: np.ndarray, bus_seats: int):
+    """
+    This function computes the boarding and departure times of many independent runs at once, keeping the seat free
+    times of every run in an (R, bus_seats) array and advancing all runs in lockstep, one customer at a time
+    Parameters
+    ----------
+    arrival_times : sorted arrival times of shape (R, n)
+    serving_times : serving times of shape (R, n), in order of arrival
+    bus_seats : number of seats on the bus (servers)
+
+    Returns
+    -------
+    The boarding times and the departure times of shape (R, n)
+    """
+
+    runs, customers = arrival_times.shape
+    rows = np.arange(runs)
+    boarded_times = np.empty((runs, customers))
+    # Times at which each seat of each run next becomes free
+    seat_free_times = np.zeros((runs, bus_seats))
+
+    for customer in range(customers):
+        # Every run seats its next customer in its earliest free seat
+        seat = seat_free_times.argmin(axis = 1)
+        boarded_time = np.maximum(arrival_times[:, customer], seat_free_times[rows, seat])
+        seat_free_times[rows, seat] = boarded_time + serving_times[:, customer]
+        boarded_times[:, customer] = boarded_time
+
+    return boarded_times, boarded_times + serving_times
+
+
+def _count_before(values: np.ndarray, queries: np.ndarray, inclusive: bool) -> np.ndarray:
+    """This function counts, row by row, how many values are <= (inclusive) or < (exclusive) each query"""
+
+    values, queries = np.atleast_2d(values), np.atleast_2d(queries)
+    combined = np.concatenate([values, queries], axis = 1) if inclusive else np.concatenate([queries, values], axis = 1)
+    is_value = np.zeros(combined.shape, dtype = np.int64)
+
+    if inclusive:
+        is_value[:, :values.shape[1]] = 1
+    else:
+        is_value[:, queries.shape[1]:] = 1
+
+    # A stable sort keeps the values ahead of equal queries when inclusive and behind them otherwise
+    order = np.argsort(combined, axis = 1, kind = 'stable')
+    counts = np.empty_like(is_value)
+    np.put_along_axis(counts, order, np.cumsum(np.take_along_axis(is_value, order, axis = 1), axis = 1), axis = 1)
+
+    return counts[:, values.shape[1]:] if inclusive else counts[:, :queries.shape[1]]
+
+
+def _masked_mean(values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """This function returns the row means of the values selected by the mask (nan for empty rows)"""
+
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        return np.where(mask, values, 0).sum(axis = 1) / mask.sum(axis = 1)
+
+
+def summarise_runs(
+        arrival_times: np.ndarray, boarded_times: np.ndarray, departure_times: np.ndarray,
+        serving_limit: int = 100, time_limit: float = float('inf')):
+    """
+    This function reproduces the statistics of run_simulation from the event times of one or more runs
+    Parameters
+    ----------
+    arrival_times : arrival times of shape (R, n), sorted along each row
+    boarded_times : boarding times of shape (R, n)
+    departure_times : departure times of shape (R, n)
+    serving_limit : the run stops at the departure event that brings the number served to this limit
+    time_limit : the run stops at the first event at or after this time
+
+    Returns
+    -------
+    A dictionary with the per-run average waiting time, queue length, serving time and customers upon arrival
+    """
+
+    arrival_times, boarded_times, departure_times = (
+        np.atleast_2d(arrival_times), np.atleast_2d(boarded_times), np.atleast_2d(departure_times))
+    runs, customers = arrival_times.shape
+    rows = np.arange(runs)
+    sorted_departures = np.sort(departure_times, axis = 1)
+
+    # Events are ordered by time, with departures handled before arrivals at the same time (as in Simulation).
+    # Find the (time, kind) of the event that ends each run, kind 0 being a departure and 1 an arrival
+    if serving_limit <= customers:
+        stop_time = sorted_departures[:, int(serving_limit) - 1]
+    else:
+        stop_time = np.full(runs, float('inf'))
+    stop_kind = np.zeros(runs, dtype = np.int64)
+
+    if np.isfinite(time_limit):
+        next_arrival = _count_before(arrival_times, np.full((runs, 1), time_limit), inclusive = False)[:, 0]
+        next_departure = _count_before(sorted_departures, np.full((runs, 1), time_limit), inclusive = False)[:, 0]
+        padded_arrivals = np.concatenate([arrival_times, np.full((runs, 1), float('inf'))], axis = 1)
+        padded_departures = np.concatenate([sorted_departures, np.full((runs, 1), float('inf'))], axis = 1)
+        limit_time = np.minimum(padded_arrivals[rows, next_arrival], padded_departures[rows, next_departure])
+        limit_kind = np.where(padded_departures[rows, next_departure] == limit_time, 0, 1)
+
+        stop_by_limit = (limit_time < stop_time) | ((limit_time == stop_time) & (limit_kind < stop_kind))
+        stop_time = np.where(stop_by_limit, limit_time, stop_time)
+        stop_kind = np.where(stop_by_limit, limit_kind, stop_kind)
+
+    stop_time, stop_kind = stop_time[:, None], stop_kind[:, None]
+
+    def happened(times, kind):
+        return (times < stop_time) | ((times == stop_time) & (kind <= stop_kind))
+
+    arrived = happened(arrival_times, 1)
+    served = happened(departure_times, 0) & np.isfinite(departure_times)
+
+    # Customers already in the system are those who arrived earlier and have not departed yet
+    index = np.arange(customers)
+    customers_upon_arrival = index - _count_before(departure_times, arrival_times, inclusive = True)
+
+    # Queue length right after each arrival and right after each distinct departure time
+    queue_after_arrival = index + 1 - _count_before(boarded_times, arrival_times, inclusive = True)
+    distinct_departure = np.ones(sorted_departures.shape, dtype = bool)
+    distinct_departure[:, 1:] = sorted_departures[:, 1:] != sorted_departures[:, :-1]
+    arrived_before = _count_before(arrival_times, sorted_departures, inclusive = False)
+    boarded_by = _count_before(boarded_times, sorted_departures, inclusive = True)
+    queue_after_departure = arrived_before - np.minimum(arrived_before, boarded_by)
+
+    arrival_events = arrived
+    departure_events = distinct_departure & happened(sorted_departures, 0) & np.isfinite(sorted_departures)
+
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        average_queue_length = (
+            (np.where(arrival_events, queue_after_arrival, 0).sum(axis = 1)
+             + np.where(departure_events, queue_after_departure, 0).sum(axis = 1))
+            / (arrival_events.sum(axis = 1) + departure_events.sum(axis = 1)))
+
+    # Customers who never arrive (infinite arrival times) are masked out, but inf - inf is computed first
+    with np.errstate(invalid = 'ignore'):
+        return {
+            'average_waiting_time': _masked_mean(boarded_times - arrival_times, served),
+            'average_queue_length': average_queue_length,
+            'average_serving_time': _masked_mean(departure_times - boarded_times, served),
+            'average_customers_upon_arrival': _masked_mean(customers_upon_arrival, arrived)}
+
+
+def _pad_serving_times(serving_times, customers: int) -> np.ndarray:
+    """This function gives customers without a serving time an infinite one, as in Simulation.generate_serving_time"""
+
+    serving_times = np.asarray(serving_times, dtype = float)[..., :customers]
+    padded_serving_times = np.full(serving_times.shape[:-1] + (customers,), float('inf'))
+    padded_serving_times[..., :serving_times.shape[-1]] = serving_times
+
+    return padded_serving_times
+
+
+def run_simulation_vectorized(
+        bus_seats: int, bus_stops: int,
+        interarrival_times: List[float], serving_times: List[float],
+        serving_limit: int = 100, time_limit: float = float('inf'), verbose: bool = False,
+        arrival_times: List[float] = None):
+
+    """This function goes through one simulation cycle of our system with the array engine, giving the same results as
+    run_simulation. arrival_times feeds the absolute arrival times of an arrival process instead of interarrival
+    times"""
+
+    if arrival_times is None:
+        arrival_times = get_arrival_times(interarrival_times)
+    else:
+        arrival_times = np.asarray(arrival_times, dtype = float)
+
+    serving_times = _pad_serving_times(serving_times, len(arrival_times))
+
+    boarded_times, departure_times = fifo_recursion(arrival_times, serving_times, bus_seats)
+    results = summarise_runs(arrival_times, boarded_times, departure_times, serving_limit, time_limit)
+
+    if verbose:
+        print("\nSimulation complete.")
+        print(f"Total arrivals is {len(arrival_times)} with {int(np.isfinite(departure_times).sum())} boarded.")
+
+    return {key: value[0] for key, value in results.items()}
+
+
+def run_simulation_batch(
+        bus_seats: int, bus_stops: int,
+        interarrival_times: np.ndarray, serving_times: np.ndarray,
+        serving_limit: int = 100, time_limit: float = float('inf'), chunk_size: int = 1000,
+        arrival_times: np.ndarray = None):
+
+    """This function simulates R independent runs of our system at once from (R, n) arrays of interarrival and serving
+    times, chunk_size runs at a time so that memory stays bounded, and returns arrays of the run_simulation statistics.
+    An (R, n) array of arrival_times feeds the absolute arrival times of an arrival process instead of interarrival
+    times"""
+
+    interarrival_times = np.atleast_2d(np.asarray(interarrival_times, dtype = float))
+    serving_times = np.atleast_2d(np.asarray(serving_times, dtype = float))
+    results = {
+        'average_waiting_time': [], 'average_queue_length': [],
+        'average_serving_time': [], 'average_customers_upon_arrival': []}
+
+    for start in range(0, len(interarrival_times), chunk_size):
+        if arrival_times is None:
+            chunk_arrival_times = get_arrival_times(interarrival_times[start:start + chunk_size])
+        else:
+            chunk_arrival_times = np.atleast_2d(np.asarray(arrival_times, dtype = float))[start:start + chunk_size]
+
+        chunk_serving_times = _pad_serving_times(serving_times[start:start + chunk_size], chunk_arrival_times.shape[1])
+
+        boarded_times, departure_times = fifo_recursion_batch(chunk_arrival_times, chunk_serving_times, bus_seats)
+        chunk_results = summarise_runs(chunk_arrival_times, boarded_times, departure_times, serving_limit, time_limit)
+
+        for key in results:
+            results[key].append(chunk_results[key])
+
+    return {key: np.concatenate(value) for key, value in results.items()}
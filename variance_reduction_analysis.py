@@ -1,5 +1,7 @@
+import os
 import pandas as pd
 from utils.simulation import run_experiment
+from utils.checkpoint import Checkpointer
 from tqdm import tqdm
 import time
 
@@ -13,11 +15,23 @@ all_results = []
 arrival_lambda = 3
 bus_seats = 38 
 bus_stops = 25
+# Experiments save their progress here every minute, and finished ones are read back from their csv, so an
+# interrupted analysis resumes where it stopped
+checkpoint = Checkpointer(os.path.join('data', 'checkpoints'), interval=60)
 
 for iterations in iterations_list:
 
     for technique in variance_reduction_techniques:
 
+        file_name = f"data/variance/{technique}-result-{iterations}.csv"
+
+        if os.path.exists(file_name):
+            result = pd.read_csv(file_name, index_col=0).iloc[0].to_dict()
+            print(f"{technique}: {result} was already computed.")
+            all_results.append(result)
+            print()
+            continue
+
         start = time.process_time()
 
         result = run_experiment(
@@ -28,7 +42,8 @@ for iterations in iterations_list:
             variance_reduction=technique,
             serving_limit=serving_limit,
             time_limit=time_limit,
-            verbose=verbose
+            verbose=verbose,
+            checkpoint=checkpoint
         )
 
         time_taken = time.process_time() - start
@@ -36,7 +51,7 @@ for iterations in iterations_list:
         print(f"{technique}: {result} took time {time_taken} to compute.")
         result['computation_time'] = time_taken
         result_df = pd.DataFrame([result])
-        result_df.to_csv(f"data/variance/{technique}-result-{iterations}.csv")
+        result_df.to_csv(file_name)
         all_results.append(result)
         print()
 